@@ -0,0 +1,72 @@
+import os
+import shutil
+import subprocess
+import torch
+from transformers import CLIPModel
+
+# Must match the batch size range VideoScorer uses (default batch size is 16)
+MIN_BATCH, OPT_BATCH, MAX_BATCH = 1, 16, 64
+
+
+class VisionEncoder(torch.nn.Module):
+    """CLIP vision tower + projection: pixel_values -> image_embeds."""
+
+    def __init__(self, model):
+        super().__init__()
+        self.vision_model = model.vision_model
+        self.visual_projection = model.visual_projection
+
+    def forward(self, pixel_values):
+        pooled_output = self.vision_model(pixel_values=pixel_values)[1]
+        return self.visual_projection(pooled_output)
+
+
+def export_tensorrt(model_name="openai/clip-vit-base-patch32"):
+    local_dir = os.path.join("models", model_name)
+    if not os.path.exists(local_dir):
+        print(f"Local model not found at {local_dir}. Run download_models.py first.")
+        return
+
+    onnx_path = os.path.join(local_dir, "clip_vision.onnx")
+    engine_path = os.path.join(local_dir, "clip_vision.trt")
+
+    print(f"Exporting vision model to {onnx_path}...")
+    model = CLIPModel.from_pretrained(local_dir).eval()
+    encoder = VisionEncoder(model)
+    image_size = model.config.vision_config.image_size
+    dummy = torch.zeros((OPT_BATCH, 3, image_size, image_size))
+
+    with torch.no_grad():
+        torch.onnx.export(
+            encoder, (dummy,), onnx_path,
+            input_names=["pixel_values"],
+            output_names=["image_embeds"],
+            dynamic_axes={"pixel_values": {0: "batch"}, "image_embeds": {0: "batch"}},
+            opset_version=17
+        )
+
+    trtexec = shutil.which("trtexec")
+    if not trtexec:
+        print("trtexec not found in PATH. Install TensorRT and build the engine with:")
+        print(f"  trtexec --onnx={onnx_path} --fp16 --saveEngine={engine_path}")
+        return
+
+    print(f"Building TensorRT engine {engine_path} (this can take a few minutes)...")
+    shape = f"3x{image_size}x{image_size}"
+    result = subprocess.run([
+        trtexec,
+        f"--onnx={onnx_path}",
+        "--fp16",
+        f"--minShapes=pixel_values:{MIN_BATCH}x{shape}",
+        f"--optShapes=pixel_values:{OPT_BATCH}x{shape}",
+        f"--maxShapes=pixel_values:{MAX_BATCH}x{shape}",
+        f"--saveEngine={engine_path}"
+    ])
+
+    if result.returncode == 0:
+        print("Engine built! VideoScorer will use it automatically on GPU.")
+    else:
+        print("Failed to build TensorRT engine.")
+
+if __name__ == "__main__":
+    export_tensorrt()
@@ -1,14 +1,139 @@
 import os
 import torch
-from PIL import Image
+import torch.nn.functional as F
 from transformers import CLIPProcessor, CLIPModel
 import cv2
 import numpy as np
-from typing import List, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Tuple
+from src.core.score_cache import SCORE_CACHE_DIR
+
+# Optional: NVDEC-backed decoding straight into CUDA tensors
+try:
+    from torchcodec.decoders import VideoDecoder
+except ImportError:
+    VideoDecoder = None
+
+# Optional: TensorRT engine for the vision tower (built by export_tensorrt.py)
+try:
+    import tensorrt as trt
+except ImportError:
+    trt = None
+
+TRT_ENGINE_FILE = "clip_vision.trt"
+
+
+class TensorRTVisionEncoder:
+    """Runs a serialized TensorRT engine mapping pixel_values -> image_embeds on CUDA tensors."""
+
+    def __init__(self, engine_path: str, embed_dim: int):
+        self.logger = trt.Logger(trt.Logger.WARNING)
+        with open(engine_path, "rb") as f:
+            self.engine = trt.Runtime(self.logger).deserialize_cuda_engine(f.read())
+        if self.engine is None:
+            raise RuntimeError(f"Could not deserialize TensorRT engine {engine_path}")
+        self.context = self.engine.create_execution_context()
+        self.embed_dim = embed_dim
+        # Largest batch the engine's optimization profile accepts
+        self.max_batch = self.engine.get_tensor_profile_shape("pixel_values", 0)[2][0]
+
+    def __call__(self, pixel_values: torch.Tensor) -> torch.Tensor:
+        """Encodes a batch of pixel values already on the GPU; returns fp32 embeddings."""
+        pixel_values = pixel_values.float().contiguous()
+        outputs = []
+        stream = torch.cuda.current_stream()
+        for start in range(0, pixel_values.shape[0], self.max_batch):
+            chunk = pixel_values[start:start + self.max_batch]
+            out = torch.empty((chunk.shape[0], self.embed_dim), device=chunk.device, dtype=torch.float32)
+            self.context.set_input_shape("pixel_values", tuple(chunk.shape))
+            self.context.set_tensor_address("pixel_values", chunk.data_ptr())
+            self.context.set_tensor_address("image_embeds", out.data_ptr())
+            if not self.context.execute_async_v3(stream.cuda_stream):
+                raise RuntimeError("TensorRT execution failed")
+            outputs.append(out)
+        return torch.cat(outputs) if len(outputs) > 1 else outputs[0]
+
+PRECISIONS = ["auto", "fp32", "fp16", "bf16", "int8"]
+
+def default_device() -> str:
+    """Device VideoScorer runs on: CUDA when available, otherwise CPU."""
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+def _frames_to_tensor(frames: List[np.ndarray], bgr: bool = False) -> torch.Tensor:
+    """Stacks (H, W, 3) uint8 frames into an RGB (N, 3, H, W) tensor without copying channels in numpy."""
+    images = torch.from_numpy(np.stack(frames)).permute(0, 3, 1, 2)
+    if bgr:
+        images = images[:, [2, 1, 0]]
+    return images
+
+def _phash(frame: np.ndarray) -> int:
+    """64-bit perceptual hash of a BGR frame: 32x32 gray DCT, low 8x8 block thresholded at its median."""
+    small = cv2.cvtColor(cv2.resize(frame, (32, 32), interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+    low = cv2.dct(np.float32(small))[:8, :8]
+    return int.from_bytes(np.packbits(low > np.median(low)).tobytes(), "big")
+
+def _decode_segment(video_path: str, frame_indices: List[int], downsample_resolution: int) -> List[Tuple[int, np.ndarray]]:
+    """Decodes the given sorted frame indices with a dedicated capture, downsampling each frame."""
+    frames = []
+    cap = cv2.VideoCapture(video_path)
+    current_frame = frame_indices[0]
+    if current_frame > 0:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, current_frame)
+    
+    for target in frame_indices:
+        # Skip frames we don't need without retrieving/converting them
+        while current_frame < target:
+            if not cap.grab():
+                break
+            current_frame += 1
+        
+        ret, frame = cap.read()
+        if not ret:
+            break
+        current_frame += 1
+        
+        # Downsample frame to reduce memory usage
+        h, w = frame.shape[:2]
+        if h > downsample_resolution:
+            scale = downsample_resolution / h
+            new_w = int(w * scale)
+            frame = cv2.resize(frame, (new_w, downsample_resolution))
+        frames.append((target, frame))
+    
+    cap.release()
+    return frames
 
 class VideoScorer:
-    def __init__(self, model_name="openai/clip-vit-base-patch32"):
-        self.device = "cuda" if torch.cuda.is_available() else "cpu"
+    # Below this many sampled frames per segment, seeking costs more than it saves
+    MIN_FRAMES_PER_SEGMENT = 8
+    # Sampled frames whose pHash differs from the last scored frame in fewer bits reuse its score
+    PHASH_THRESHOLD = 5
+    # Prompts to identify "good" content
+    PROMPTS = ["a photo of a happy family", "a beautiful landscape", "people smiling", "clear and bright image"]
+
+    def __init__(self, model_name="openai/clip-vit-base-patch32", precision="auto",
+                 batch_size: int = 16, compile_model: bool = False, decode_workers: int = None,
+                 cache_dir: str = SCORE_CACHE_DIR, cuda_graphs: bool = False):
+        """
+        Args:
+            model_name: CLIP model to load (local copy under models/ is preferred)
+            precision: 'auto', 'fp32', 'fp16', 'bf16' or 'int8'.
+                       'auto' uses fp16 on CUDA and fp32 on CPU.
+                       fp16/bf16 require CUDA; int8 (dynamic quantization) requires CPU.
+            batch_size: Default number of frames scored per forward pass
+            compile_model: Compile the vision tower with torch.compile for kernel fusion
+            decode_workers: Threads used to decode sampled frames (default: min(4, cpu count))
+            cache_dir: Directory for cached per-video scores used by score_cache.load_or_score
+                       (None disables the cache)
+            cuda_graphs: Replay the vision forward from a captured CUDA graph (CUDA, eager mode only;
+                         torch.compile's reduce-overhead mode already uses CUDA graphs)
+        """
+        self.model_name = model_name
+        self.cache_dir = cache_dir
+        self.device = default_device()
+        self.precision = self._resolve_precision(precision)
+        self.batch_size = batch_size
+        self.decode_workers = decode_workers or min(4, os.cpu_count() or 1)
         
         # Check for local model
         local_path = os.path.join("models", model_name)
@@ -19,52 +144,340 @@ class VideoScorer:
             print(f"Loading AI Model ({model_name}) from Hub on {self.device}...")
             load_path = model_name
 
-        self.model = CLIPModel.from_pretrained(load_path).to(self.device)
+        if self.precision == "fp16":
+            self.dtype = torch.float16
+        elif self.precision == "bf16":
+            self.dtype = torch.bfloat16
+        else:
+            self.dtype = torch.float32
+
+        self.model = CLIPModel.from_pretrained(load_path, torch_dtype=self.dtype).to(self.device).eval()
+        if self.precision == "int8":
+            # Quantize Linear layers to INT8 (weights ahead of time, activations on the fly)
+            self.model = torch.ao.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
         self.processor = CLIPProcessor.from_pretrained(load_path)
-        print("Model loaded.")
+        
+        # CLIP image preprocessing constants, applied with torch ops on self.device
+        image_processor = self.processor.image_processor
+        self._resize_size = image_processor.size["shortest_edge"]
+        self._crop_size = (image_processor.crop_size["height"], image_processor.crop_size["width"])
+        # Mean/std are built once in the model dtype so normalization can run in place
+        self._mean = torch.tensor(image_processor.image_mean, device=self.device, dtype=self.dtype).view(1, 3, 1, 1)
+        self._std = torch.tensor(image_processor.image_std, device=self.device, dtype=self.dtype).view(1, 3, 1, 1)
+        
+        # Normalized text embeddings keyed by prompt tuple (prompts rarely change)
+        self._prompt_cache = {}
+        # Side stream so the upload/preprocessing of the next batch overlaps the current forward
+        self._prep_stream = torch.cuda.Stream() if self.device == "cuda" else None
+        # Pinned host batch buffers keyed by frame shape, reused across batches and videos
+        self._pinned_buffers = {}
+        
+        self._vision = self.model.vision_model
+        self._trt_encoder = self._load_trt_encoder(load_path)
+        # Vision forward implementation; part of the score cache key with the precision
+        self.backend = "tensorrt" if self._trt_encoder is not None else "torch"
+        self._graph = None
+        if compile_model and self._trt_encoder is None:
+            self._compile_vision()
+        elif cuda_graphs and self.device == "cuda" and self._trt_encoder is None:
+            self._capture_vision_graph()
+        print(f"Model loaded ({self.precision}).")
+
+    def _load_trt_encoder(self, load_path: str):
+        """Loads a TensorRT vision engine saved next to a local model, if one exists and CUDA is in use."""
+        engine_path = os.path.join(load_path, TRT_ENGINE_FILE)
+        if self.device != "cuda" or trt is None or not os.path.exists(engine_path):
+            return None
+        try:
+            encoder = TensorRTVisionEncoder(engine_path, self.model.config.projection_dim)
+            print(f"Using TensorRT vision engine from {engine_path}")
+            return encoder
+        except Exception as e:
+            print(f"Warning: could not load TensorRT engine, using PyTorch: {e}")
+            return None
+
+    def _compile_vision(self):
+        """Compiles the vision tower and warms it up; keeps eager mode if compilation fails."""
+        print("Compiling vision model (first run can take a minute)...")
+        try:
+            self._vision = torch.compile(self.model.vision_model, mode="reduce-overhead", fullgraph=True)
+            # Warm up on a full batch so compilation (and CUDA graph capture) happens now
+            dummy = torch.zeros((self.batch_size, 3, *self._crop_size), device=self.device, dtype=self.dtype)
+            with torch.no_grad():
+                self._encode_images(dummy)
+        except Exception as e:
+            print(f"Warning: torch.compile failed, using eager mode: {e}")
+            self._vision = self.model.vision_model
+
+    def _capture_vision_graph(self):
+        """Captures the eager vision forward for a full batch as a CUDA graph; keeps eager mode on failure."""
+        print("Capturing CUDA graph for the vision model...")
+        try:
+            static_input = torch.zeros((self.batch_size, 3, *self._crop_size), device=self.device, dtype=self.dtype)
+            with torch.no_grad():
+                # Warm up on a side stream so lazy initialization stays out of the graph
+                warmup_stream = torch.cuda.Stream()
+                warmup_stream.wait_stream(torch.cuda.current_stream())
+                with torch.cuda.stream(warmup_stream):
+                    for _ in range(3):
+                        self._encode_images(static_input)
+                torch.cuda.current_stream().wait_stream(warmup_stream)
+                
+                graph = torch.cuda.CUDAGraph()
+                with torch.cuda.graph(graph):
+                    static_output = self._encode_images(static_input)
+            self._graph, self._graph_input, self._graph_output = graph, static_input, static_output
+        except Exception as e:
+            print(f"Warning: CUDA graph capture failed, using eager mode: {e}")
+            self._graph = None
+
+    def _resolve_precision(self, precision: str) -> str:
+        """Maps the requested precision to one supported on the current device."""
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown precision '{precision}'. Expected one of: {', '.join(PRECISIONS)}")
+        if precision == "auto":
+            return "fp16" if self.device == "cuda" else "fp32"
+        if precision in ("fp16", "bf16") and self.device != "cuda":
+            print(f"Warning: {precision} requires CUDA, falling back to fp32 on CPU.")
+            return "fp32"
+        if precision == "int8" and self.device != "cpu":
+            print("Warning: int8 quantization is CPU-only, using fp16 on CUDA instead.")
+            return "fp16"
+        return precision
+
+    def _get_text_features(self, text_prompts: List[str]) -> torch.Tensor:
+        """Returns L2-normalized text embeddings for the prompts, computing them only once."""
+        key = tuple(text_prompts)
+        if key not in self._prompt_cache:
+            text_inputs = self.processor(text=text_prompts, return_tensors="pt", padding=True).to(self.device)
+            with torch.no_grad():
+                text_features = self.model.get_text_features(**text_inputs)
+            self._prompt_cache[key] = F.normalize(text_features, dim=-1)
+        return self._prompt_cache[key]
+
+    def _preprocess(self, images: torch.Tensor) -> torch.Tensor:
+        """
+        Vectorized equivalent of CLIPProcessor image preprocessing for a whole batch.
+        Takes uint8 RGB images shaped (N, 3, H, W) and returns normalized pixel values
+        on self.device: resize shortest edge, center crop, rescale and normalize.
+        """
+        images = images.to(self.device, non_blocking=True).float().div_(255.0)
+        
+        h, w = images.shape[-2:]
+        scale = self._resize_size / min(h, w)
+        new_h, new_w = max(self._crop_size[0], round(h * scale)), max(self._crop_size[1], round(w * scale))
+        images = F.interpolate(images, size=(new_h, new_w), mode="bicubic", align_corners=False, antialias=True)
+        
+        crop_h, crop_w = self._crop_size
+        top, left = (new_h - crop_h) // 2, (new_w - crop_w) // 2
+        pixel_values = images[:, :, top:top + crop_h, left:left + crop_w].clamp_(0.0, 1.0).to(self.dtype)
+        
+        # Normalize in place on the resized batch (no extra allocations)
+        return pixel_values.sub_(self._mean).div_(self._std)
+
+    def _encode_images(self, pixel_values: torch.Tensor) -> torch.Tensor:
+        """Image embeddings from the (possibly compiled) vision tower, as in CLIPModel.get_image_features."""
+        if self._trt_encoder is not None:
+            return self._trt_encoder(pixel_values).to(self.dtype)
+        num_images = pixel_values.shape[0]
+        if self._graph is not None and num_images <= self.batch_size:
+            # Partial batches reuse the captured shape; rows are independent, the tail is ignored
+            self._graph_input[:num_images].copy_(pixel_values)
+            self._graph.replay()
+            return self._graph_output[:num_images].clone()
+        pooled_output = self._vision(pixel_values=pixel_values)[1]
+        return self.model.visual_projection(pooled_output)
 
     def score_frame(self, frame: np.ndarray, text_prompts: List[str]) -> float:
         """
         Scores a single frame against a list of positive prompts.
         Returns the maximum similarity score.
         """
-        image = Image.fromarray(frame)
-        inputs = self.processor(text=text_prompts, images=image, return_tensors="pt", padding=True).to(self.device)
+        return self.score_frames_batch([frame], text_prompts)[0]
+
+    def score_frames_batch(self, frames: List[np.ndarray], text_prompts: List[str], bgr: bool = False) -> List[float]:
+        """
+        Scores a batch of same-sized frames against a list of positive prompts in a single forward pass.
+        Frames are RGB uint8 arrays, or BGR (as read by OpenCV) when bgr=True.
+        Returns the maximum similarity score for each frame.
+        """
+        return self._score_images(_frames_to_tensor(frames, bgr), text_prompts).tolist()
+
+    def _score_images(self, images: torch.Tensor, text_prompts: List[str]) -> torch.Tensor:
+        """
+        Scores uint8 RGB images shaped (N, 3, H, W), on any device, in a single forward pass.
+        Returns an (N,) float32 tensor left on self.device, so callers decide when to sync.
+        """
+        text_features = self._get_text_features(text_prompts)
         
         with torch.no_grad():
-            outputs = self.model(**inputs)
-            logits_per_image = outputs.logits_per_image  # this is the image-text similarity score
-            probs = logits_per_image.softmax(dim=1)
+            if self._prep_stream is not None and not images.is_cuda:
+                # Host frames: copy and preprocess on the side stream, then hand over
+                with torch.cuda.stream(self._prep_stream):
+                    pixel_values = self._preprocess(images)
+                torch.cuda.current_stream().wait_stream(self._prep_stream)
+                pixel_values.record_stream(torch.cuda.current_stream())
+            else:
+                pixel_values = self._preprocess(images)
             
-        # Return the sum of probabilities for the positive prompts
-        # Or just the raw logit if we want absolute similarity
-        return probs.max().item()
+            # Only the vision tower runs per batch; text embeddings are cached
+            image_features = self._encode_images(pixel_values)
+            image_features = F.normalize(image_features, dim=-1)
+            logits_per_image = image_features @ text_features.T * self.model.logit_scale.exp()  # (num_frames, num_prompts)
+            # Softmax in fp32 for stability regardless of model precision
+            probs = logits_per_image.float().softmax(dim=1)
+            
+        # Best matching prompt per frame
+        return probs.max(dim=1).values
+
+    def _decode_frames(self, video_path: str, frame_indices: List[int],
+                       downsample_resolution: int) -> Iterator[Tuple[int, np.ndarray]]:
+        """
+        Yields (frame_index, bgr_frame) for the requested sorted frame indices.
+        
+        The indices are split into contiguous segments decoded concurrently, each with its
+        own capture that seeks to the segment start (OpenCV seeks to the preceding keyframe
+        and decodes forward). Frames in between are only grabbed, never converted.
+        OpenCV releases the GIL while decoding, so threads run in parallel.
+        """
+        if not frame_indices:
+            return
+        
+        num_segments = min(self.decode_workers, -(-len(frame_indices) // self.MIN_FRAMES_PER_SEGMENT))
+        segments = [seg.tolist() for seg in np.array_split(frame_indices, max(1, num_segments))]
+        
+        if len(segments) == 1:
+            yield from _decode_segment(video_path, segments[0], downsample_resolution)
+            return
+        
+        with ThreadPoolExecutor(max_workers=len(segments)) as executor:
+            results = executor.map(_decode_segment, [video_path] * len(segments), segments,
+                                   [downsample_resolution] * len(segments))
+            for segment_frames in results:
+                yield from segment_frames
+
+    def _decode_batches_cpu(self, video_path: str, frame_indices: List[int], downsample_resolution: int,
+                            batch_size: int, duplicates: dict = None) -> Iterator[Tuple[List[int], torch.Tensor]]:
+        """
+        Yields (frame_indices, rgb_images) batches decoded on the CPU with OpenCV.
+        
+        If a duplicates dict is given, frames perceptually identical to the last yielded
+        frame (pHash distance below PHASH_THRESHOLD) are left out of the batches and
+        recorded as duplicates[frame_idx] = index of that frame.
+        
+        Frames are converted to RGB straight into one preallocated batch buffer that is
+        reused for every batch, so each yielded batch must be consumed before the next.
+        On CUDA the buffer is pinned and uploaded from directly; its previous upload is
+        waited for only when the next frame is about to overwrite it.
+        """
+        batch_indices = []
+        images, buffer = None, None
+        upload_pending = False
+        last_idx, last_hash = None, None
+        
+        for frame_idx, frame in self._decode_frames(video_path, frame_indices, downsample_resolution):
+            if duplicates is not None:
+                frame_hash = _phash(frame)
+                if last_hash is not None and bin(frame_hash ^ last_hash).count("1") < self.PHASH_THRESHOLD:
+                    duplicates[frame_idx] = last_idx
+                    continue
+                last_idx, last_hash = frame_idx, frame_hash
+            
+            if buffer is not None and buffer.shape[1:] != frame.shape:
+                # Frame size changed mid-stream: flush and reallocate
+                if batch_indices:
+                    yield batch_indices, images[:len(batch_indices)].permute(0, 3, 1, 2)
+                    batch_indices = []
+                    upload_pending = True
+                images, buffer = None, None
+            if buffer is None:
+                images, buffer = self._batch_buffer(min(batch_size, len(frame_indices)), frame.shape)
+            if upload_pending and self._prep_stream is not None:
+                # The side stream may still be copying the last batch out of the pinned buffer
+                self._prep_stream.synchronize()
+            upload_pending = False
+            
+            cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=buffer[len(batch_indices)])
+            batch_indices.append(frame_idx)
+            
+            if len(batch_indices) == len(buffer):
+                yield batch_indices, images.permute(0, 3, 1, 2)
+                batch_indices = []
+                upload_pending = True
+        
+        if batch_indices:
+            yield batch_indices, images[:len(batch_indices)].permute(0, 3, 1, 2)
+
+    def _batch_buffer(self, rows: int, frame_shape: Tuple[int, ...]) -> Tuple[torch.Tensor, np.ndarray]:
+        """
+        Returns (tensor, array) views of one uninitialized uint8 buffer for rows frames.
+        On CUDA the memory is pinned and allocated once per frame shape, then reused.
+        """
+        if self.device != "cuda":
+            images = torch.empty((rows,) + frame_shape, dtype=torch.uint8)
+            return images, images.numpy()
+        pinned = self._pinned_buffers.get(frame_shape)
+        if pinned is None or len(pinned) < rows:
+            pinned = torch.empty((rows,) + frame_shape, dtype=torch.uint8, pin_memory=True)
+            self._pinned_buffers[frame_shape] = pinned
+        images = pinned[:rows]
+        return images, images.numpy()
+
+    def _decode_batches_gpu(self, decoder, frame_indices: List[int],
+                            batch_size: int) -> Iterator[Tuple[List[int], torch.Tensor]]:
+        """
+        Yields (frame_indices, rgb_images) batches decoded by NVDEC directly into CUDA memory.
+        No host copy or CPU color conversion; resizing happens in _preprocess on the GPU.
+        """
+        # Container frame counts can disagree with OpenCV's estimate
+        num_frames = decoder.metadata.num_frames
+        if num_frames:
+            frame_indices = [idx for idx in frame_indices if idx < num_frames]
+        
+        for start in range(0, len(frame_indices), batch_size):
+            batch_indices = frame_indices[start:start + batch_size]
+            yield batch_indices, decoder.get_frames_at(indices=batch_indices).data
+
+    def _open_gpu_decoder(self, video_path: str):
+        """Returns a CUDA VideoDecoder for the video, or None to use the CPU path."""
+        if self.device != "cuda" or VideoDecoder is None:
+            return None
+        try:
+            return VideoDecoder(video_path, device="cuda")
+        except Exception as e:
+            print(f"GPU decoding unavailable for {video_path}, using CPU: {e}")
+            return None
 
     def analyze_video(self, video_path: str, interval_sec: float = 1.0, max_frames: int = 100, 
-                     downsample_resolution: int = 480) -> List[Tuple[float, float]]:
+                     downsample_resolution: int = 480, batch_size: int = None) -> np.ndarray:
         """
-        Analyzes a video and returns a list of (timestamp, score) tuples.
+        Analyzes a video and returns its scores as a float32 array shaped (N, 2):
+        one (timestamp, score) row per sampled frame, in time order.
         
         Memory optimizations:
         - Limits total frames analyzed to max_frames
+        - Decodes on the GPU via torchcodec (NVDEC) when available
         - Downsamples frames to reduce memory footprint
         - Clears GPU cache after processing
+        - Scores sampled frames in batches to keep the model busy
+        - Skips near-identical frames (static shots) on the CPU path via perceptual hashing
         
         Args:
             video_path: Path to video file
             interval_sec: Interval between analyzed frames in seconds
             max_frames: Maximum number of frames to analyze (default: 100)
             downsample_resolution: Target height for frame downsampling (default: 480)
+            batch_size: Number of frames scored per forward pass (default: scorer's batch_size)
         """
+        batch_size = batch_size or self.batch_size
+        
         cap = cv2.VideoCapture(video_path)
         fps = cap.get(cv2.CAP_PROP_FPS)
         frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.release()
         duration = frame_count / fps
         
-        scores = []
-        
-        # Prompts to identify "good" content
-        prompts = ["a photo of a happy family", "a beautiful landscape", "people smiling", "clear and bright image"]
+        prompts = self.PROMPTS
         
         # Calculate sampling strategy
         frames_to_analyze = min(max_frames, int(duration / interval_sec))
@@ -76,40 +489,40 @@ class VideoScorer:
             actual_interval = interval_sec
             print(f"Analyzing {video_path} ({duration:.1f}s) - sampling every {interval_sec:.1f}s...")
         
-        current_frame = 0
-        frames_analyzed = 0
+        # Process every Nth frame (based on actual interval)
+        step = max(1, int(fps * actual_interval))
+        frame_indices = [i for i in range(0, step * frames_to_analyze, step) if i < frame_count]
         
-        while cap.isOpened() and frames_analyzed < frames_to_analyze:
-            ret, frame = cap.read()
-            if not ret:
-                break
-                
-            # Process every Nth frame (based on actual interval)
-            timestamp = current_frame / fps
-            if current_frame % int(fps * actual_interval) == 0:
-                # Downsample frame to reduce memory usage
-                h, w = frame.shape[:2]
-                if h > downsample_resolution:
-                    scale = downsample_resolution / h
-                    new_w = int(w * scale)
-                    frame = cv2.resize(frame, (new_w, downsample_resolution))
-                
-                # Convert BGR to RGB
-                frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                score = self.score_frame(frame_rgb, prompts)
-                scores.append((timestamp, score))
-                frames_analyzed += 1
-                
-                # Release frame memory immediately
-                del frame_rgb
-                
-            current_frame += 1
-            
-        cap.release()
+        duplicates = {}
+        decoder = self._open_gpu_decoder(video_path)
+        if decoder is not None:
+            batches = self._decode_batches_gpu(decoder, frame_indices, batch_size)
+        else:
+            batches = self._decode_batches_cpu(video_path, frame_indices, downsample_resolution, batch_size,
+                                               duplicates)
+        
+        # Scores stay on the device until every batch is queued: one sync per video, not per batch
+        scored_indices = []
+        batch_scores = []
+        for batch_indices, images in batches:
+            batch_scores.append(self._score_images(images, prompts))
+            scored_indices.extend(batch_indices)
+            del images
+        
+        frame_scores = dict(zip(scored_indices, torch.cat(batch_scores).cpu().tolist())) if batch_scores else {}
+        if duplicates:
+            print(f"Skipped {len(duplicates)} near-duplicate frames")
+        
+        # Skipped frames take the score of the frame they duplicate, keeping the timeline evenly sampled
+        scores = []
+        for idx in frame_indices:
+            source = duplicates.get(idx, idx)
+            if source in frame_scores:
+                scores.append((idx / fps, frame_scores[source]))
         
         # Clear GPU cache if using CUDA
         if self.device == "cuda":
             torch.cuda.empty_cache()
         
-        return scores
+        return np.asarray(scores, dtype=np.float32).reshape(-1, 2)
 
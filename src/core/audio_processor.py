@@ -1,5 +1,7 @@
 import librosa
 import numpy as np
+import soundfile
+import soxr
 from typing import List
 import scipy.signal
 
@@ -10,29 +12,55 @@ if not hasattr(scipy.signal, 'hann'):
     except AttributeError:
         pass # If windows doesn't exist either, we might be in trouble or on very old scipy
 
+# Sample rate used for analysis (librosa's default)
+TARGET_SR = 22050
+HOP_LENGTH = 512
+
 class AudioProcessor:
     def __init__(self, audio_path: str):
         self.audio_path = audio_path
         self.y = None
         self.sr = None
         self.duration = 0
+        self.onset_env = None
         self.beats = []
         
     def load_audio(self):
-        """Loads the audio file."""
+        """Loads the audio file as mono float32 at TARGET_SR."""
         print(f"Loading audio: {self.audio_path}...")
-        self.y, self.sr = librosa.load(self.audio_path)
+        try:
+            # libsndfile decode + SIMD resampler: much faster than librosa's audioread fallback
+            y, sr = soundfile.read(self.audio_path, dtype='float32', always_2d=False)
+            if y.ndim > 1:
+                y = y.mean(axis=1)
+            if sr != TARGET_SR:
+                y = soxr.resample(y, sr, TARGET_SR)
+            self.y, self.sr = y, TARGET_SR
+        except soundfile.LibsndfileError:
+            # Formats libsndfile can't read (e.g. m4a) go through librosa/audioread
+            self.y, self.sr = librosa.load(self.audio_path, sr=TARGET_SR)
         self.duration = librosa.get_duration(y=self.y, sr=self.sr)
         print(f"Audio loaded. Duration: {self.duration:.2f}s")
 
+    def get_onset_envelope(self) -> np.ndarray:
+        """Computes the onset strength envelope once and caches it for re-analysis."""
+        if self.y is None:
+            self.load_audio()
+        if self.onset_env is None:
+            # Same envelope beat_track computes internally (median aggregation across bands)
+            self.onset_env = librosa.onset.onset_strength(y=self.y, sr=self.sr, hop_length=HOP_LENGTH,
+                                                          aggregate=np.median)
+        return self.onset_env
+
     def detect_beats(self) -> np.ndarray:
         """Detects beats in the audio and returns their timestamps."""
         if self.y is None:
             self.load_audio()
             
         print("Detecting beats...")
-        tempo, beat_frames = librosa.beat.beat_track(y=self.y, sr=self.sr)
-        self.beats = librosa.frames_to_time(beat_frames, sr=self.sr)
+        tempo, beat_frames = librosa.beat.beat_track(onset_envelope=self.get_onset_envelope(), sr=self.sr,
+                                                     hop_length=HOP_LENGTH)
+        self.beats = librosa.frames_to_time(beat_frames, sr=self.sr, hop_length=HOP_LENGTH)
         print(f"Detected {len(self.beats)} beats. Tempo: {tempo:.2f} BPM")
         return self.beats
 
@@ -0,0 +1,75 @@
+import os
+import numpy as np
+import xxhash
+from typing import Optional
+
+# Per-video score cache, reused across runs while the source file is unchanged
+SCORE_CACHE_DIR = os.path.expanduser("~/.cache/video-highlight")
+FINGERPRINT_CHUNK = 1024 * 1024  # Bytes hashed from each end of the file
+
+
+def file_fingerprint(path: str) -> str:
+    """Cheap content fingerprint: size, mtime and an xxh3 hash of the first and last MB."""
+    stat = os.stat(path)
+    digest = xxhash.xxh3_64()
+    with open(path, "rb") as f:
+        digest.update(f.read(FINGERPRINT_CHUNK))
+        if stat.st_size > 2 * FINGERPRINT_CHUNK:
+            f.seek(-FINGERPRINT_CHUNK, os.SEEK_END)
+        digest.update(f.read(FINGERPRINT_CHUNK))
+    return f"{stat.st_size}-{stat.st_mtime_ns}-{digest.hexdigest()}"
+
+
+def cache_path(scorer, video_path: str, interval_sec: float, max_frames: int,
+               downsample_resolution: int) -> str:
+    """Cache file for this video's content and the scorer settings that affect its scores."""
+    key = repr((file_fingerprint(video_path), scorer.model_name, scorer.precision, scorer.backend,
+                tuple(scorer.PROMPTS), interval_sec, max_frames, downsample_resolution,
+                scorer.PHASH_THRESHOLD))
+    return os.path.join(scorer.cache_dir, xxhash.xxh3_64_hexdigest(key.encode()) + ".npz")
+
+
+def load_scores(path: str) -> Optional[np.ndarray]:
+    """Returns the cached (N, 2) float32 (timestamp, score) array, or None if missing or unreadable."""
+    try:
+        with np.load(path) as data:
+            scores = data["scores"]
+    except (OSError, KeyError, ValueError):
+        return None
+    if scores.ndim != 2 or scores.shape[1] != 2:
+        return None
+    return scores.astype(np.float32, copy=False)
+
+
+def save_scores(path: str, scores: np.ndarray):
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename so an interrupted run never leaves a truncated cache file
+        tmp_path = path + ".tmp.npz"
+        np.savez(tmp_path, scores=np.asarray(scores, dtype=np.float32).reshape(-1, 2))
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Warning: Could not write score cache: {e}")
+
+
+def load_or_score(scorer, video_path: str, interval_sec: float = 1.0, max_frames: int = 100,
+                  downsample_resolution: int = 480) -> np.ndarray:
+    """
+    Returns scorer.analyze_video(...) for the video, reusing scores cached on disk
+    when the file and settings are unchanged. The cache is skipped when
+    scorer.cache_dir is None.
+    """
+    if not scorer.cache_dir:
+        return scorer.analyze_video(video_path, interval_sec=interval_sec, max_frames=max_frames,
+                                    downsample_resolution=downsample_resolution)
+
+    path = cache_path(scorer, video_path, interval_sec, max_frames, downsample_resolution)
+    scores = load_scores(path)
+    if scores is not None:
+        print(f"Using cached scores for {video_path}")
+        return scores
+
+    scores = scorer.analyze_video(video_path, interval_sec=interval_sec, max_frames=max_frames,
+                                  downsample_resolution=downsample_resolution)
+    save_scores(path, scores)
+    return scores
@@ -1,21 +1,157 @@
 from moviepy.editor import VideoFileClip, concatenate_videoclips, AudioFileClip, vfx, ImageClip, CompositeVideoClip
+from moviepy.config import get_setting
+import functools
 import random
-from typing import List
+from collections import OrderedDict
+from typing import List, Tuple
 import os
 import subprocess
 import json
+import tempfile
 from PIL import Image, ImageDraw, ImageFont, ExifTags
 import numpy as np
+from src.utils.media_probe import video_display_rotation, video_duration
+
+# Optional: in-process container metadata (avoids spawning ffprobe per video)
+try:
+    import av
+except ImportError:
+    av = None
+
+# EXIF Orientation value -> counter-clockwise rotation to display upright
+EXIF_ROTATIONS = {3: 180, 6: 270, 8: 90}
+
+# Counter-clockwise rotation -> ffmpeg filter producing the same result
+ROTATION_FILTERS = {90: "transpose=2", 180: "hflip,vflip", 270: "transpose=1"}
+
+# Largest gap (seconds) between video and audio duration that is left uncorrected
+AUDIO_SYNC_TOLERANCE = 0.1
+
+
+def fill_clip_duration(audio_duration: float, num_clips: int, transition_duration: float,
+                       overlaps: int = None) -> float:
+    """
+    Per-clip duration that makes num_clips clips last exactly audio_duration when
+    `overlaps` of them are shortened by transition_duration (default num_clips - 1:
+    one crossfade per join).
+    """
+    if num_clips <= 0:
+        return 5.0
+    if overlaps is None:
+        overlaps = num_clips - 1
+    return (audio_duration + overlaps * transition_duration) / num_clips
+
+
+def letterbox(clip, width: int, height: int):
+    """
+    Fits a clip within width x height keeping its aspect ratio, centered on black.
+    
+    The resized frames are padded with a single np.pad per frame rather than
+    blitted onto a background by CompositeVideoClip.
+    """
+    scale = min(width / clip.w, height / clip.h)
+    # Keep dimensions even so the padding splits evenly and H.264 accepts them
+    new_w = max(2, int(clip.w * scale) // 2 * 2)
+    new_h = max(2, int(clip.h * scale) // 2 * 2)
+    pad_x = (width - new_w) // 2
+    pad_y = (height - new_h) // 2
+    pad = ((pad_y, height - new_h - pad_y), (pad_x, width - new_w - pad_x))
+    
+    def pad_frame(frame):
+        # Works for RGB frames and 2D masks alike (zero = black / transparent)
+        return np.pad(frame, pad + ((0, 0),) * (frame.ndim - 2))
+    
+    return clip.resize(newsize=(new_w, new_h)).fl_image(pad_frame, apply_to=["mask"])
+
+@functools.lru_cache(maxsize=1)
+def has_nvenc() -> bool:
+    """
+    Checks once per process whether MoviePy's ffmpeg can encode with NVENC (h264_nvenc).
+    The encoder being compiled in is not enough (common ffmpeg builds always include it),
+    so a tiny test encode confirms an NVIDIA GPU/driver is actually usable.
+    """
+    ffmpeg = get_setting("FFMPEG_BINARY")
+    try:
+        encoders = subprocess.run([ffmpeg, "-hide_banner", "-encoders"], capture_output=True, text=True, timeout=10)
+        if "h264_nvenc" not in encoders.stdout:
+            return False
+        test = subprocess.run([
+            ffmpeg, "-hide_banner", "-loglevel", "error",
+            "-f", "lavfi", "-i", "color=black:size=256x256:duration=0.1",
+            "-c:v", "h264_nvenc", "-f", "null", "-"
+        ], capture_output=True, timeout=15)
+        return test.returncode == 0
+    except (OSError, subprocess.SubprocessError):
+        return False
 
 class VideoProcessor:
+    # Source videos kept open for reuse by create_clip
+    VIDEO_CACHE_SIZE = 32
+
     def __init__(self):
         self.clips = []
+        self._video_cache = OrderedDict()  # path -> VideoFileClip, least recently used first
+        self._evicted_videos = []  # Handles dropped from _video_cache, fully closed by close_cache
+        self._rotation_cache = {}
+
+    def _open_video(self, media_path: str) -> VideoFileClip:
+        """Returns an open VideoFileClip for the path, reusing the reader across subclips."""
+        clip = self._video_cache.get(media_path)
+        if clip is not None:
+            self._video_cache.move_to_end(media_path)
+            return clip
+        
+        clip = VideoFileClip(media_path)
+        self._video_cache[media_path] = clip
+        if len(self._video_cache) > self.VIDEO_CACHE_SIZE:
+            # Stop the oldest handle's ffmpeg decoder now. Subclips handed out earlier may still
+            # read from it: the video reader restarts on demand, but the audio reader cannot,
+            # so the handle itself is only closed by close_cache.
+            _, evicted = self._video_cache.popitem(last=False)
+            evicted.reader.close()
+            self._evicted_videos.append(evicted)
+        return clip
+
+    def close_cache(self):
+        """Closes all cached video handles. Clips created from them become unusable."""
+        for clip in self._video_cache.values():
+            clip.close()
+        self._video_cache.clear()
+        for clip in self._evicted_videos:
+            clip.close()
+        self._evicted_videos.clear()
 
     def get_video_rotation(self, media_path: str) -> int:
         """
-        Robustly detects video rotation using ffprobe, checking both tags and side_data.
+        Robustly detects video rotation, checking both tags and the display matrix.
+        Uses PyAV when installed, otherwise ffprobe.
         Returns the rotation in degrees (e.g. 90, -90, 180, 270) or 0 if none.
+        Results are cached per path.
         """
+        if media_path not in self._rotation_cache:
+            if av is not None:
+                rotation = self._read_video_rotation(media_path)
+            else:
+                rotation = self._probe_video_rotation(media_path)
+            self._rotation_cache[media_path] = rotation
+        return self._rotation_cache[media_path]
+
+    def _read_video_rotation(self, media_path: str) -> int:
+        """Rotation read from the stream tags and side data, without decoding a frame."""
+        try:
+            with av.open(media_path) as container:
+                stream = container.streams.video[0]
+                # Legacy 'rotate' tag
+                if 'rotate' in stream.metadata:
+                    return int(float(stream.metadata['rotate']))
+        except (av.FFmpegError, IndexError, ValueError) as e:
+            print(f"Error checking rotation for {media_path}: {e}")
+            return 0
+        # PyAV only exposes the display matrix on decoded frames; OpenCV reads it
+        # from the stream side data when the file is opened
+        return video_display_rotation(media_path)
+
+    def _probe_video_rotation(self, media_path: str) -> int:
         try:
             cmd = [
                 "ffprobe", 
@@ -49,6 +185,49 @@ class VideoProcessor:
             print(f"Error checking rotation for {media_path}: {e}")
             return 0
         
+    def get_encoder_settings(self) -> Tuple[str, str, List[str]]:
+        """Returns (codec, preset, extra ffmpeg params) for H.264 output (High Compatibility)."""
+        if has_nvenc():
+            print("Using GPU encoding (h264_nvenc)...")
+            codec = 'h264_nvenc'
+            preset = 'p4'  # Balanced NVENC preset
+            ffmpeg_params = [
+                '-rc', 'vbr',
+                '-cq', '23',  # Constant quality target, comparable to libx264 CRF 23
+                '-b:v', '0',
+            ]
+        else:
+            print("Using CPU encoding (libx264)...")
+            codec = 'libx264'
+            preset = 'veryfast'  # Much faster than 'medium' at CRF 23 with a small size increase
+            ffmpeg_params = [
+                '-crf', '23',  # Constant Rate Factor (18-28, lower = better quality)
+            ]
+        ffmpeg_params += [
+            '-profile:v', 'main',  # Use main profile for better compatibility
+            '-level', '4.0',  # H.264 level 4.0 (supports 1080p)
+            '-pix_fmt', 'yuv420p',  # Standard pixel format for compatibility
+        ]
+        return codec, preset, ffmpeg_params
+
+    def get_image_rotation(self, image_path: str) -> int:
+        """
+        Returns the counter-clockwise rotation (0, 90, 180 or 270 degrees) needed to display
+        an image upright according to its EXIF Orientation tag.
+        """
+        try:
+            with Image.open(image_path) as pil_img:
+                exif = pil_img._getexif()
+            if exif is None:
+                return 0
+            for orientation in ExifTags.TAGS.keys():
+                if ExifTags.TAGS[orientation] == 'Orientation':
+                    break
+            return EXIF_ROTATIONS.get(dict(exif.items()).get(orientation), 0)
+        except (AttributeError, KeyError, IndexError, OSError):
+            # No EXIF or other error, ignore
+            return 0
+
     def create_clip(self, media_path: str, start_time: float, duration: float) -> VideoFileClip:
         """Creates a subclip from a video file or an image clip."""
         try:
@@ -60,25 +239,9 @@ class VideoProcessor:
                 pil_img = Image.open(media_path)
                 
                 # Handle EXIF Rotation
-                try:
-                    for orientation in ExifTags.TAGS.keys():
-                        if ExifTags.TAGS[orientation] == 'Orientation':
-                            break
-                    
-                    exif = pil_img._getexif()
-                    if exif is not None:
-                        exif = dict(exif.items())
-                        orientation = exif.get(orientation)
-                        
-                        if orientation == 3:
-                            pil_img = pil_img.rotate(180, expand=True)
-                        elif orientation == 6:
-                            pil_img = pil_img.rotate(270, expand=True)
-                        elif orientation == 8:
-                            pil_img = pil_img.rotate(90, expand=True)
-                except (AttributeError, KeyError, IndexError):
-                    # No EXIF or other error, ignore
-                    pass
+                rotation = self.get_image_rotation(media_path)
+                if rotation:
+                    pil_img = pil_img.rotate(rotation, expand=True)
                 
                 # Convert back to numpy for MoviePy
                 img_np = np.array(pil_img)
@@ -89,7 +252,7 @@ class VideoProcessor:
                 return clip
             else:
                 # It's a video
-                clip = VideoFileClip(media_path)
+                clip = self._open_video(media_path)
                 
                 # Aspect Ratio Correction based on Rotation Metadata
                 # The user requested: "I do not want to change the rotation, I just want to fix it by adding black spacing"
@@ -115,6 +278,21 @@ class VideoProcessor:
 
     def create_title_clip(self, text: str, width: int, height: int, duration: float = 5.0) -> VideoFileClip:
         """Creates a cinematic title clip using PIL with animation."""
+        img = self.render_title_image(text, width, height)
+        
+        # Convert to numpy array for MoviePy
+        img_np = np.array(img)
+        
+        # Create ImageClip
+        txt_clip = ImageClip(img_np, duration=duration)
+        
+        # Add animations: Fade in and Fade out
+        txt_clip = txt_clip.crossfadein(1.0).crossfadeout(1.0)
+        
+        return txt_clip
+
+    def render_title_image(self, text: str, width: int, height: int) -> Image.Image:
+        """Renders the title text centered on a transparent RGBA image."""
         # Create transparent image
         img = Image.new('RGBA', (width, height), (0, 0, 0, 0))
         draw = ImageDraw.Draw(img)
@@ -143,24 +321,11 @@ class VideoProcessor:
         stroke_color = (0, 0, 0, 255) # Black
         text_color = (255, 215, 0, 255) # Gold
         
-        # Draw outline
-        for adj_x in range(-stroke_width, stroke_width + 1):
-            for adj_y in range(-stroke_width, stroke_width + 1):
-                draw.text((x + adj_x, y + adj_y), text, font=font, fill=stroke_color)
-                
-        # Draw main text
-        draw.text((x, y), text, font=font, fill=text_color)
-        
-        # Convert to numpy array for MoviePy
-        img_np = np.array(img)
-        
-        # Create ImageClip
-        txt_clip = ImageClip(img_np, duration=duration)
-        
-        # Add animations: Fade in and Fade out
-        txt_clip = txt_clip.crossfadein(1.0).crossfadeout(1.0)
+        # Draw text and outline in a single rasterization pass
+        draw.text((x, y), text, font=font, fill=text_color,
+                  stroke_width=stroke_width, stroke_fill=stroke_color)
         
-        return txt_clip
+        return img
 
     def assemble_video(self, clips: List[VideoFileClip], audio_path: str, output_path: str, transition_duration: float = 0.5, output_width: int = 1920, title_text: str = None):
         """Concatenates clips and adds background music with transitions."""
@@ -170,34 +335,18 @@ class VideoProcessor:
 
         print(f"Assembling {len(clips)} clips with {transition_duration}s crossfade...")
         
+        # Ensure dimensions are even (required by H.264 codec)
+        target_width = output_width if output_width % 2 == 0 else output_width - 1
+        target_height = int(output_width * 9 / 16)
+        target_height = target_height if target_height % 2 == 0 else target_height - 1
+        
         # Apply crossfade to all clips except the first one
         # Also resize clips to target resolution
         processed_clips = []
         for i, clip in enumerate(clips):
-            # Ensure dimensions are even (required by H.264 codec)
-            target_width = output_width if output_width % 2 == 0 else output_width - 1
-            target_height = int(output_width * 9 / 16)
-            target_height = target_height if target_height % 2 == 0 else target_height - 1
-            
             # Resize to fit within target dimensions while maintaining aspect ratio
             # Then center on black background (letterbox/pillarbox)
-            
-            # Calculate aspect ratios
-            clip_ratio = clip.w / clip.h
-            target_ratio = target_width / target_height
-            
-            if clip_ratio > target_ratio:
-                # Clip is wider than target (fit to width)
-                # Resize by width only to preserve aspect ratio
-                resized_content = clip.resize(width=target_width)
-            else:
-                # Clip is taller than target (fit to height)
-                # Resize by height only to preserve aspect ratio
-                resized_content = clip.resize(height=target_height)
-            
-            # Composite onto black background
-            # Note: CompositeVideoClip default background is transparent (black in mp4)
-            final_clip = CompositeVideoClip([resized_content.set_position("center")], size=(target_width, target_height))
+            final_clip = letterbox(clip, target_width, target_height)
             
             if i > 0:
                 final_clip = final_clip.crossfadein(transition_duration)
@@ -219,7 +368,7 @@ class VideoProcessor:
             audio = AudioFileClip(audio_path)
             
             # Ensure final video matches audio duration exactly
-            if abs(final_video.duration - audio.duration) > 0.1:
+            if abs(final_video.duration - audio.duration) > AUDIO_SYNC_TOLERANCE:
                 print(f"Adjusting video duration from {final_video.duration:.2f}s to match audio {audio.duration:.2f}s")
                 # If video is shorter, slow it down slightly; if longer, speed it up
                 speed_factor = final_video.duration / audio.duration
@@ -229,20 +378,192 @@ class VideoProcessor:
             
         print(f"Writing output to {output_path}... (Resolution: {output_width}x{int(output_width * 9 / 16)})")
         
-        # Configure encoding parameters (CPU - High Compatibility)
-        print("Using CPU encoding (libx264)...")
+        codec, preset, ffmpeg_params = self.get_encoder_settings()
+        
         final_video.write_videofile(
             output_path,
             fps=24,
-            codec='libx264',
+            codec=codec,
             audio_codec='aac',
-            preset='medium',
-            ffmpeg_params=[
-                '-profile:v', 'main',  # Use main profile for better compatibility
-                '-level', '4.0',  # H.264 level 4.0 (supports 1080p)
-                '-pix_fmt', 'yuv420p',  # Standard pixel format for compatibility
-                '-crf', '23',  # Constant Rate Factor (18-28, lower = better quality)
-            ],
-            threads=os.cpu_count() or 4
+            preset=preset,
+            bitrate=None,  # Quality-based rate control; no bitrate target
+            ffmpeg_params=ffmpeg_params,
+            threads=os.cpu_count() or 4,
+            write_logfile=False
         )
         print("Done!")
+
+    def matches_audio(self, video_paths: List[str], audio_path: str) -> bool:
+        """
+        True if the videos played back to back last as long as the audio (within
+        AUDIO_SYNC_TOLERANCE), so concat_videos needs no retiming to stay in sync.
+        """
+        total = sum(video_duration(path) for path in video_paths)
+        audio = AudioFileClip(audio_path)
+        try:
+            audio_duration = audio.duration
+        finally:
+            audio.close()
+        return abs(total - audio_duration) <= AUDIO_SYNC_TOLERANCE
+
+    def concat_videos(self, video_paths: List[str], audio_path: str, output_path: str):
+        """
+        Joins videos encoded with identical settings (e.g. batch outputs) with ffmpeg's
+        concat demuxer, copying the video stream instead of re-encoding it.
+        Cuts are hard (no crossfade); the result is trimmed to the audio length.
+        """
+        print(f"Joining {len(video_paths)} videos without re-encoding...")
+        with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as f:
+            list_file = f.name
+            for path in video_paths:
+                # Concat list syntax: single quotes escaped as '\''
+                escaped = os.path.abspath(path).replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+        
+        cmd = [get_setting("FFMPEG_BINARY"), "-y", "-hide_banner", "-loglevel", "error",
+               "-f", "concat", "-safe", "0", "-i", list_file]
+        if audio_path:
+            cmd += ["-i", audio_path, "-map", "0:v", "-map", "1:a", "-c:a", "aac", "-shortest"]
+        cmd += ["-c:v", "copy", output_path]
+        
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True)
+            if result.returncode != 0:
+                raise RuntimeError(f"ffmpeg concat failed: {result.stderr.strip()}")
+        finally:
+            os.remove(list_file)
+        print("Done!")
+
+    def render_with_ffmpeg(self, segments: List[Tuple[str, float, float]], audio_path: str, output_path: str,
+                           transition_duration: float = 0.5, output_width: int = 1920, title_text: str = None,
+                           title_duration: float = 5.0, fps: int = 24):
+        """
+        Renders the highlight video with a single ffmpeg filtergraph instead of MoviePy.
+        
+        Same layout as assemble_video (letterbox/pillarbox, crossfades, title, audio sync),
+        but frames never enter Python: ffmpeg scales, pads, crossfades (xfade) and overlays
+        the title natively.
+        
+        Args:
+            segments: List of (media_path, start_time, duration) tuples, in output order
+        """
+        if not segments:
+            print("No clips to assemble.")
+            return
+        
+        print(f"Rendering {len(segments)} clips with ffmpeg ({transition_duration}s crossfade)...")
+        
+        # Ensure dimensions are even (required by H.264 codec)
+        target_width = output_width if output_width % 2 == 0 else output_width - 1
+        target_height = int(output_width * 9 / 16)
+        target_height = target_height if target_height % 2 == 0 else target_height - 1
+        
+        cmd = [get_setting("FFMPEG_BINARY"), "-y", "-hide_banner", "-loglevel", "error"]
+        filters = []
+        
+        for i, (media_path, start_time, duration) in enumerate(segments):
+            ext = os.path.splitext(media_path)[1].lower()
+            chain = []
+            if ext in ['.jpg', '.jpeg', '.png']:
+                cmd += ["-loop", "1", "-framerate", str(fps), "-t", f"{duration:.3f}", "-i", media_path]
+                rotation = self.get_image_rotation(media_path)
+                if rotation:
+                    chain.append(ROTATION_FILTERS[rotation])
+            else:
+                # ffmpeg applies rotation metadata itself, which yields the same upright
+                # aspect ratio as the squeeze correction in create_clip
+                cmd += ["-ss", f"{start_time:.3f}", "-t", f"{duration:.3f}", "-i", media_path]
+            
+            chain += [
+                # Fit within target, then center on black (letterbox/pillarbox)
+                f"scale={target_width}:{target_height}:force_original_aspect_ratio=decrease",
+                f"pad={target_width}:{target_height}:(ow-iw)/2:(oh-ih)/2:color=black",
+                "setsar=1",
+                "format=yuv420p",
+                # Hold the last frame if the source ends early so crossfade offsets stay exact
+                f"tpad=stop_mode=clone:stop_duration={duration:.3f}",
+                f"trim=duration={duration:.3f}",
+                "setpts=PTS-STARTPTS",
+                # Constant frame rate and time base, as xfade requires
+                f"fps={fps}",
+            ]
+            filters.append(f"[{i}:v]{','.join(chain)}[v{i}]")
+        
+        # Chain crossfades: each clip starts transition_duration before the previous one ends
+        last = "v0"
+        total_duration = segments[0][2]
+        for i in range(1, len(segments)):
+            offset = total_duration - transition_duration
+            filters.append(f"[{last}][v{i}]xfade=transition=fade:duration={transition_duration}:offset={offset:.3f}[x{i}]")
+            last = f"x{i}"
+            total_duration = offset + segments[i][2]
+        
+        post = []
+        title_file = None
+        if title_text:
+            print(f"Adding title: {title_text}")
+            # Same PIL-rendered title as assemble_video, overlaid and faded by ffmpeg
+            with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as f:
+                title_file = f.name
+            self.render_title_image(title_text, target_width, target_height).save(title_file)
+            cmd += ["-loop", "1", "-framerate", str(fps), "-t", f"{title_duration:.3f}", "-i", title_file]
+            fade = 1.0
+            filters.append(
+                f"[{len(segments)}:v]format=rgba,"
+                f"fade=t=in:st=0:d={fade}:alpha=1,"
+                f"fade=t=out:st={title_duration - fade}:d={fade}:alpha=1[title]"
+            )
+            filters.append(f"[{last}][title]overlay=0:0:eof_action=pass[titled]")
+            last = "titled"
+        
+        audio_duration = None
+        if audio_path:
+            print(f"Adding audio from {audio_path}...")
+            audio = AudioFileClip(audio_path)
+            audio_duration = audio.duration
+            audio.close()
+            
+            # Ensure final video matches audio duration exactly
+            if abs(total_duration - audio_duration) > 0.1:
+                print(f"Adjusting video duration from {total_duration:.2f}s to match audio {audio_duration:.2f}s")
+                # If video is shorter, slow it down slightly; if longer, speed it up
+                post.append(f"setpts=PTS*{audio_duration / total_duration:.6f}")
+                total_duration = audio_duration
+        
+        if post:
+            filters.append(f"[{last}]{','.join(post)}[vout]")
+            last = "vout"
+        
+        if audio_path:
+            cmd += ["-i", audio_path]
+        cmd += ["-filter_complex", ";".join(filters), "-map", f"[{last}]"]
+        if audio_path:
+            audio_input = len(segments) + (1 if title_file else 0)
+            cmd += ["-map", f"{audio_input}:a", "-c:a", "aac", "-t", f"{audio_duration:.3f}"]
+        
+        print(f"Writing output to {output_path}... (Resolution: {target_width}x{target_height})")
+        codec, preset, ffmpeg_params = self.get_encoder_settings()
+        cmd += ["-r", str(fps), "-c:v", codec, "-preset", preset] + ffmpeg_params
+        cmd += ["-progress", "pipe:1", "-nostats", output_path]
+        
+        try:
+            process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+            # Report progress in the same "t: NN%" form as MoviePy so the UI can track it
+            last_pct = -1
+            for line in process.stdout:
+                if line.startswith("out_time_us="):
+                    try:
+                        pct = min(100, int(int(line.split("=")[1]) / 1e6 / total_duration * 100))
+                    except ValueError:
+                        continue
+                    if pct != last_pct:
+                        print(f"t: {pct}%", flush=True)
+                        last_pct = pct
+            stderr = process.stderr.read()
+            process.wait()
+            if process.returncode != 0:
+                raise RuntimeError(f"ffmpeg failed: {stderr.strip()}")
+        finally:
+            if title_file:
+                os.remove(title_file)
+        print("Done!")
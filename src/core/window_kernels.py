@@ -0,0 +1,105 @@
+import numpy as np
+from typing import Tuple
+
+# Optional: JIT-compiled window scan
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# Ties within this tolerance go to the earliest start (absorbs summation rounding)
+TIE_TOLERANCE = 1e-9
+
+
+def uniform_window_width(times: np.ndarray, duration: float) -> int:
+    """
+    Number of samples in every window [t, t + duration] when timestamps are uniformly
+    spaced, or 0 if they are not (windows then need explicit bounds).
+    """
+    if len(times) < 2:
+        return 0
+    steps = np.diff(times)
+    if steps.std() >= 1e-3:
+        return 0
+    return int(np.floor(duration / steps.mean() + 1e-6)) + 1
+
+
+def _best_window_py(times: np.ndarray, vals: np.ndarray, duration: float, width: int) -> Tuple[float, float]:
+    """NumPy prefix-sum scan, used when numba is not installed."""
+    n = len(times)
+    if n == 0:
+        return 0.0, -1.0
+
+    # Candidate starts, in order, whose window fits before the last sample
+    num_starts = int(np.count_nonzero(times + duration <= times[-1]))
+    if num_starts == 0:
+        return 0.0, -1.0
+
+    csum = np.concatenate(([0.0], np.cumsum(vals)))
+    if width:
+        starts = np.arange(num_starts)
+        ends = np.minimum(starts + width, n)
+    else:
+        starts = np.searchsorted(times, times[:num_starts], side='left')
+        ends = np.searchsorted(times, times[:num_starts] + duration, side='right')
+    averages = (csum[ends] - csum[starts]) / (ends - starts)
+
+    best = int(np.argmax(averages >= averages.max() - TIE_TOLERANCE))
+    return float(times[best]), float(averages[best])
+
+
+def _best_window_loop(times, vals, duration, width):
+    """Single pass with a running sum: add samples entering the window, subtract those leaving."""
+    n = len(times)
+    averages = np.empty(n)
+    num_starts = 0
+    running = 0.0
+    end = 0
+    for i in range(n):
+        t = times[i]
+        if t + duration > times[n - 1]:
+            break
+        if width:
+            limit = min(i + width, n)
+            while end < limit:
+                running += vals[end]
+                end += 1
+        else:
+            while end < n and times[end] <= t + duration:
+                running += vals[end]
+                end += 1
+        if i > 0:
+            running -= vals[i - 1]
+        averages[i] = running / (end - i)
+        num_starts += 1
+
+    if num_starts == 0:
+        return 0.0, -1.0
+    best_avg = averages[0]
+    for i in range(1, num_starts):
+        best_avg = max(best_avg, averages[i])
+    for i in range(num_starts):
+        if averages[i] >= best_avg - TIE_TOLERANCE:
+            return times[i], averages[i]
+    return times[0], averages[0]
+
+
+if njit is not None:
+    _best_window_kernel = njit(cache=True, fastmath=True)(_best_window_loop)
+else:
+    _best_window_kernel = _best_window_py
+
+
+def best_window(times: np.ndarray, vals: np.ndarray, duration: float) -> Tuple[float, float]:
+    """
+    Returns (start_time, avg_score) of the window [t, t + duration] with the highest
+    average score, considering only windows that end by the last timestamp.
+    Takes contiguous float64 arrays of sorted timestamps and their scores.
+    """
+    start, avg = _best_window_kernel(times, vals, float(duration), uniform_window_width(times, duration))
+    return float(start), float(avg)
+
+
+def warm_up():
+    """Triggers JIT compilation (or loads it from the numba cache) before the real work starts."""
+    best_window(np.arange(4, dtype=np.float64), np.zeros(4), 1.0)
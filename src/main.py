@@ -1,10 +1,19 @@
 import os
+import sys
 import argparse
+import multiprocessing
+from operator import itemgetter
 import random
 import gc
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from src.utils.file_manager import get_media_files
+from src.utils.media_probe import video_duration
+from src.core.ai_scorer import VideoScorer, default_device
 from src.core.audio_processor import AudioProcessor
-from src.core.video_processor import VideoProcessor
+from src.core.video_processor import VideoProcessor, fill_clip_duration
+from src.core.score_cache import load_or_score
+from src.core.window_kernels import best_window, warm_up as warm_up_window_kernels
 from src.utils.memory_monitor import (
     estimate_total_memory, 
     check_memory_safety, 
@@ -24,18 +33,37 @@ def main():
                        help="Skip memory safety checks (use with caution)")
     parser.add_argument("--max-frames", type=int, default=100,
                        help="Maximum frames to analyze per video for AI scoring")
+    parser.add_argument("--precision", default="auto", choices=["auto", "fp32", "fp16", "bf16", "int8"],
+                       help="AI model precision (auto = fp16 on GPU, fp32 on CPU)")
+    parser.add_argument("--compile", action="store_true",
+                       help="Compile the AI model with torch.compile (slower startup, faster scoring)")
+    parser.add_argument("--cuda-graphs", action="store_true",
+                       help="Replay the AI model from a captured CUDA graph (GPU only, lower launch overhead)")
+    parser.add_argument("--workers", type=int, default=1,
+                       help="Processes scoring videos in parallel, each with its own AI model (0 = auto: half the CPU cores)")
+    parser.add_argument("--no-cache", action="store_true",
+                       help="Re-score every video instead of reusing cached AI scores")
+    parser.add_argument("--renderer", default="moviepy", choices=["moviepy", "ffmpeg"],
+                       help="Video renderer (ffmpeg = single native filtergraph, no frames through Python)")
     args = parser.parse_args()
 
+    # Compile the window scan up front instead of during the first video
+    warm_up_window_kernels()
+    
     print(f"Input Directory: {args.input}")
     print(f"Audio File: {args.audio}")
 
     # 1. Scan files
-    videos, images = get_media_files(args.input)
+    videos, images = get_media_files(args.input, with_mtime=True)
     print(f"Found {len(videos)} videos and {len(images)} images.")
     
     # Merge and sort by date (Modification time is usually more reliable for "Date Taken" on copied files)
-    all_media = videos + images
-    all_media.sort(key=lambda x: os.path.getmtime(x))
+    # (path, is_image) pairs: the type is known from the scan, no per-loop extension checks.
+    # Sorted on the mtime captured during the scan, so no file is stat'd twice
+    dated_media = [(mtime, path, False) for path, mtime in videos] + [(mtime, path, True) for path, mtime in images]
+    dated_media.sort(key=itemgetter(0))
+    all_media = [(path, is_image) for _, path, is_image in dated_media]
+    media_paths = [path for path, _ in all_media]
     
     if not all_media:
         print("No media found. Exiting.")
@@ -50,18 +78,21 @@ def main():
     num_media = len(all_media)
     
     # Calculate target duration per clip to fill the audio
-    target_total_duration = audio_proc.duration + (num_media - 1) * transition_duration
-    target_clip_duration = target_total_duration / num_media if num_media > 0 else 5.0
+    target_clip_duration = fill_clip_duration(audio_proc.duration, num_media, transition_duration)
     
     print(f"Target Duration per clip: {target_clip_duration:.2f}s (Total Audio: {audio_proc.duration:.2f}s)")
     
     # 3. Memory Check
     if not args.skip_memory_check:
         print("\n=== Memory Safety Check ===")
-        memory_estimate = estimate_total_memory(all_media, target_width=1920, clip_duration=target_clip_duration)
+        memory_estimate = estimate_total_memory(media_paths, target_width=1920, clip_duration=target_clip_duration,
+                                                image_flags=[is_image for _, is_image in all_media])
         
         print(f"Estimated memory needed: {format_memory_size(memory_estimate['total_estimated'])}")
         print(f"Estimated peak memory: {format_memory_size(memory_estimate['peak_memory'])}")
+        if memory_estimate['truncated']:
+            print(f"(Estimate stopped after {len(memory_estimate['per_file'])} of {num_media} files: "
+                  f"already far beyond system memory)")
         
         is_safe, warning_level, message = check_memory_safety(memory_estimate['peak_memory'])
         print(message)
@@ -70,8 +101,7 @@ def main():
             print("\nRECOMMENDATION: Use batch processing to prevent crashes.")
             if args.batch_size == 0:
                 # Auto-calculate batch size
-                batch_size = calculate_optimal_batch_size(all_media, target_width=1920, 
-                                                         clip_duration=target_clip_duration)
+                batch_size = calculate_optimal_batch_size(memory_estimate)
                 print(f"Auto-calculated batch size: {batch_size} videos per batch")
             else:
                 batch_size = args.batch_size
@@ -86,75 +116,88 @@ def main():
         batch_size = args.batch_size if args.batch_size > 0 else num_media
     
     # 4. Process videos (with batching if needed)
-    from src.core.ai_scorer import VideoScorer
-    scorer = VideoScorer()
+    scorer_kwargs = dict(precision=args.precision, compile_model=args.compile, cuda_graphs=args.cuda_graphs)
+    if args.no_cache:
+        scorer_kwargs["cache_dir"] = None
+    workers = args.workers if args.workers > 0 else max(1, (os.cpu_count() or 2) // 2)
+    num_videos = len(videos)
+    workers = min(workers, num_videos) if num_videos else 1
+    
+    global _worker_scorer
+    scorer = None
+    executor = None
+    if workers > 1 and sys.platform != "win32" and default_device() == "cpu" and not args.compile:
+        # Forked workers inherit the model loaded here copy-on-write instead of each loading one.
+        # (CUDA cannot be used across fork, and compiled models are not fork-safe.)
+        print(f"Scoring videos with {workers} forked worker processes (shared model)")
+        scorer = VideoScorer(**scorer_kwargs)
+        _worker_scorer = scorer
+        threads = max(1, (os.cpu_count() or workers) // workers)
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("fork"),
+                                       initializer=_init_forked_worker, initargs=(threads,))
+    elif workers > 1:
+        # Each worker process loads its own model; the main process only builds clips
+        print(f"Scoring videos with {workers} worker processes")
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(scorer_kwargs,))
+    else:
+        scorer = VideoScorer(**scorer_kwargs)
     
     video_proc = VideoProcessor()
     
     # Determine if we need batch processing
     use_batching = batch_size < num_media
     
-    if use_batching:
-        print(f"\n=== Batch Processing Mode ===")
-        print(f"Processing {num_media} files in batches of {batch_size}")
-        process_in_batches(all_media, args.audio, args.output, scorer, video_proc,
-                          target_clip_duration, transition_duration, args.title, 
-                          batch_size, args.max_frames)
-    else:
-        print(f"\n=== Standard Processing Mode ===")
-        process_all_at_once(all_media, args.audio, args.output, scorer, video_proc,
-                           target_clip_duration, transition_duration, args.title,
-                           args.max_frames)
+    try:
+        if use_batching:
+            print(f"\n=== Batch Processing Mode ===")
+            print(f"Processing {num_media} files in batches of {batch_size}")
+            if args.renderer == "moviepy" and not args.title:
+                # Batches are joined back to back (concat_videos), and MoviePy's negative-padding
+                # concatenation shortens every clip of a batch by the crossfade, the last one
+                # included. Plan for that so the joined batches add up to the music length.
+                target_clip_duration = fill_clip_duration(audio_proc.duration, num_media,
+                                                          transition_duration, overlaps=num_media)
+            process_in_batches(all_media, args.audio, args.output, scorer, video_proc,
+                              target_clip_duration, transition_duration, args.title, 
+                              batch_size, args.max_frames, args.renderer, executor)
+        else:
+            print(f"\n=== Standard Processing Mode ===")
+            process_all_at_once(all_media, args.audio, args.output, scorer, video_proc,
+                               target_clip_duration, transition_duration, args.title,
+                               args.max_frames, args.renderer, executor)
+    finally:
+        if executor is not None:
+            executor.shutdown()
     
     print("\n=== Video generation complete! ===")
 
 
 def process_all_at_once(all_media, audio_path, output_path, scorer, video_proc,
-                        target_clip_duration, transition_duration, title_text, max_frames):
+                        target_clip_duration, transition_duration, title_text, max_frames,
+                        renderer="moviepy", executor=None):
     """Process all media files at once (original behavior)."""
-    selected_clips = []
     num_media = len(all_media)
     
-    for i, media_path in enumerate(all_media):
-        print(f"Processing {os.path.basename(media_path)}... ({i+1}/{num_media})")
-        print(f"PROGRESS_UPDATE:{int(((i+1) / num_media) * 80)}")
-        
-        ext = os.path.splitext(media_path)[1].lower()
-        is_image = ext in ['.jpg', '.jpeg', '.png']
-        
-        start_time = 0
-        duration = target_clip_duration
-        
-        if not is_image:
-             # Video: Find best segment of 'duration'
-             scores = scorer.analyze_video(media_path, interval_sec=1.0, max_frames=max_frames)
-             if scores:
-                 # If video is shorter than target, use full video
-                 video_len = scores[-1][0] + 1.0 # approx
-                 
-                 if video_len < duration:
-                     duration = video_len
-                     start_time = 0
-                 else:
-                     # Find best window
-                     start_time, _ = find_best_window(scores, duration)
-             else:
-                 # Fallback if scorer fails
-                 pass
-        
-        clip = video_proc.create_clip(media_path, start_time=start_time, duration=duration)
-        if clip:
-            selected_clips.append(clip)
+    planned = plan_segments(all_media, scorer, executor, target_clip_duration, max_frames,
+                            start_idx=0, num_media=num_media, progress_span=80)
+    selected_clips = _build_clips(planned, video_proc, renderer)
 
     # Assemble
+    if renderer == "ffmpeg":
+        video_proc.render_with_ffmpeg(selected_clips, audio_path, output_path,
+                                      transition_duration=transition_duration,
+                                      output_width=1920, title_text=title_text)
+        return
+    
     video_proc.assemble_video(selected_clips, audio_path, output_path, 
                              transition_duration=transition_duration, 
                              output_width=1920, title_text=title_text)
+    video_proc.close_cache()
 
 
 def process_in_batches(all_media, audio_path, output_path, scorer, video_proc,
                       target_clip_duration, transition_duration, title_text, 
-                      batch_size, max_frames):
+                      batch_size, max_frames, renderer="moviepy", executor=None):
     """Process media files in batches to limit memory usage."""
     import tempfile
     from moviepy.editor import VideoFileClip, concatenate_videoclips
@@ -164,6 +207,13 @@ def process_in_batches(all_media, audio_path, output_path, scorer, video_proc,
     
     temp_dir = tempfile.mkdtemp(prefix="video_highlight_")
     batch_files = []
+    batch_durations = []
+    
+    # Batch videos are written on a background thread while the next batch is scored
+    # (encoding runs in ffmpeg, outside the GIL). At most one batch is pending, so no
+    # more than two batches of clips are held open at once.
+    assembler = ThreadPoolExecutor(max_workers=1)
+    pending = None
     
     try:
         # Process each batch
@@ -175,60 +225,51 @@ def process_in_batches(all_media, audio_path, output_path, scorer, video_proc,
             print(f"\n--- Batch {batch_idx + 1}/{num_batches} ---")
             print(f"Processing files {start_idx + 1} to {end_idx} of {num_media}")
             
-            selected_clips = []
-            
-            for i, media_path in enumerate(batch_media):
-                global_idx = start_idx + i
-                print(f"Processing {os.path.basename(media_path)}... ({global_idx+1}/{num_media})")
-                print(f"PROGRESS_UPDATE:{int(((global_idx+1) / num_media) * 70)}")
-                
-                ext = os.path.splitext(media_path)[1].lower()
-                is_image = ext in ['.jpg', '.jpeg', '.png']
-                
-                start_time = 0
-                duration = target_clip_duration
-                
-                if not is_image:
-                    scores = scorer.analyze_video(media_path, interval_sec=1.0, max_frames=max_frames)
-                    if scores:
-                        video_len = scores[-1][0] + 1.0
-                        if video_len < duration:
-                            duration = video_len
-                            start_time = 0
-                        else:
-                            start_time, _ = find_best_window(scores, duration)
-                
-                clip = video_proc.create_clip(media_path, start_time=start_time, duration=duration)
-                if clip:
-                    selected_clips.append(clip)
+            planned = plan_segments(batch_media, scorer, executor, target_clip_duration, max_frames,
+                                    start_idx=start_idx, num_media=num_media, progress_span=70)
+            # Each batch gets its own VideoProcessor: its cached readers are closed by the
+            # assembly job once the batch is written, independently of the next batch's clips
+            batch_proc = VideoProcessor()
+            selected_clips = _build_clips(planned, batch_proc, renderer)
             
             # Save this batch as a temporary video
             batch_output = os.path.join(temp_dir, f"batch_{batch_idx:03d}.mp4")
-            print(f"Saving batch {batch_idx + 1} to temporary file...")
-            
-            # Create a temporary VideoProcessor for this batch
-            batch_proc = VideoProcessor()
-            # Don't add audio or title yet - just concatenate clips
-            batch_proc.assemble_video(selected_clips, None, batch_output,
-                                     transition_duration=transition_duration,
-                                     output_width=1920, title_text=None)
-            
             batch_files.append(batch_output)
+            if renderer == "ffmpeg":
+                # Crossfades overlap consecutive clips by transition_duration
+                batch_durations.append(sum(d for _, _, d in selected_clips) - (len(selected_clips) - 1) * transition_duration)
             
-            # Clean up clips from memory
-            for clip in selected_clips:
-                clip.close()
-                del clip
-            selected_clips.clear()
-            gc.collect()
-            
-            print(f"Batch {batch_idx + 1} complete. Memory released.")
+            if pending is not None:
+                pending.result()  # Re-raises a failed assembly
+            print(f"Saving batch {batch_idx + 1} to temporary file...")
+            # The job takes ownership of selected_clips; this loop rebinds it next batch
+            pending = assembler.submit(_assemble_batch, batch_proc, selected_clips, batch_output,
+                                       batch_idx, transition_duration, renderer)
+        
+        if pending is not None:
+            pending.result()
+        assembler.shutdown(wait=True)
+        # The garbage collector runs once after the last batch, not at every boundary
+        gc.collect()
         
         # Now concatenate all batch files
         print(f"\n=== Final Assembly ===")
         print(f"Combining {len(batch_files)} batch files...")
         print(f"PROGRESS_UPDATE:80")
         
+        if renderer == "ffmpeg":
+            video_proc.render_with_ffmpeg(list(zip(batch_files, [0] * len(batch_files), batch_durations)),
+                                          audio_path, output_path,
+                                          transition_duration=transition_duration,
+                                          output_width=1920, title_text=title_text)
+            return
+        
+        if not title_text and video_proc.matches_audio(batch_files, audio_path):
+            # Batches share codec and resolution, so they can be joined without re-encoding.
+            # This path joins batches with hard cuts; the MoviePy path below crossfades them.
+            video_proc.concat_videos(batch_files, audio_path, output_path)
+            return
+        
         final_clips = [VideoFileClip(bf) for bf in batch_files]
         final_video_proc = VideoProcessor()
         
@@ -243,6 +284,8 @@ def process_in_batches(all_media, audio_path, output_path, scorer, video_proc,
             clip.close()
         
     finally:
+        # Let a running assembly finish before its output directory is removed
+        assembler.shutdown(wait=True)
         # Clean up temporary files
         print("Cleaning up temporary files...")
         import shutil
@@ -252,34 +295,140 @@ def process_in_batches(all_media, audio_path, output_path, scorer, video_proc,
             print(f"Warning: Could not remove temp directory: {e}")
 
 
-def find_best_window(scores, duration):
-    best_start = 0
-    best_score = -1
+def _assemble_batch(batch_proc, clips, batch_output, batch_idx, transition_duration, renderer):
+    """Assembler job: writes one batch (no audio or title yet) and releases its readers."""
+    if renderer == "ffmpeg":
+        batch_proc.render_with_ffmpeg(clips, None, batch_output,
+                                      transition_duration=transition_duration,
+                                      output_width=1920, title_text=None)
+        print(f"Batch {batch_idx + 1} complete.")
+        return
     
-    for i in range(len(scores)):
-        t, s = scores[i]
-        if t + duration > scores[-1][0]:
-            break
-        
-        # Calculate avg score for this window
-        # Simple approximation: just take the score at start? 
-        # Better: Average of all scores within [t, t+duration]
-        window_scores = [sc for time, sc in scores if t <= time <= t + duration]
-        if not window_scores:
-            continue
-        avg_score = sum(window_scores) / len(window_scores)
+    batch_proc.assemble_video(clips, None, batch_output,
+                              transition_duration=transition_duration,
+                              output_width=1920, title_text=None)
+    # Video clips share the processor's cached readers, so closing the cache frees them all
+    clips.clear()
+    batch_proc.close_cache()
+    print(f"Batch {batch_idx + 1} complete. Memory released.")
+
+
+# Scorer used by worker processes (loaded by _init_worker, or inherited through fork)
+_worker_scorer = None
+
+def _init_worker(scorer_kwargs):
+    """Process pool initializer: loads one VideoScorer per worker."""
+    global _worker_scorer
+    _worker_scorer = VideoScorer(**scorer_kwargs)
+
+
+def _init_forked_worker(num_threads):
+    """Process pool initializer for forked workers: splits the CPU cores between them."""
+    import torch
+    torch.set_num_threads(num_threads)
+
+
+def _pick_clip(media_path, is_image, scorer, target_clip_duration, max_frames):
+    """Chooses the (start_time, duration) segment to use from one file."""
+    start_time = 0
+    duration = target_clip_duration
+    
+    if not is_image:
+        # Short video: the whole clip is used, so there is nothing to score
+        video_len = video_duration(media_path)
+        if 0 < video_len <= duration + 0.1:
+            return 0, video_len
         
-        if avg_score > best_score:
-            best_score = avg_score
-            best_start = t
+        # Video: Find best segment of 'duration'
+        scores = load_or_score(scorer, media_path, interval_sec=1.0, max_frames=max_frames)
+        if len(scores):
+            # If video is shorter than target, use full video
+            video_len = float(scores[-1, 0]) + 1.0 # approx
             
-    return best_start, best_score
+            if video_len < duration:
+                duration = video_len
+                start_time = 0
+            else:
+                # Find best window
+                start_time, _ = find_best_window(scores, duration)
+        # else: fallback if scorer fails (start of the video)
+    
+    return start_time, duration
+
+
+def _score_one(media_path, target_clip_duration, max_frames, scorer=None):
+    """Picks the segment for one video; runs in pool workers with their own scorer."""
+    start_time, duration = _pick_clip(media_path, False, scorer or _worker_scorer, target_clip_duration, max_frames)
+    return media_path, start_time, duration
 
-def get_window_score(scores, start_time, duration):
-    window_scores = [sc for time, sc in scores if start_time <= time <= start_time + duration]
-    if not window_scores:
-        return 0.0
-    return sum(window_scores) / len(window_scores)
+
+def _build_clips(planned, video_proc, renderer):
+    """
+    Turns planned (media_path, start_time, duration) segments into MoviePy clips.
+    The ffmpeg renderer reads the sources itself, so it gets the segments unchanged.
+    """
+    if renderer == "ffmpeg":
+        return list(planned)
+    clips = []
+    for media_path, start_time, duration in planned:
+        clip = video_proc.create_clip(media_path, start_time=start_time, duration=duration)
+        if clip:
+            clips.append(clip)
+    return clips
+
+
+def plan_segments(media, scorer, executor, target_clip_duration, max_frames,
+                  start_idx, num_media, progress_span):
+    """
+    Returns (media_path, start_time, duration) for each (media_path, is_image) entry,
+    in input order.
+    
+    Videos are scored in the executor's worker processes when one is given;
+    images need no scoring and are handled in this process.
+    """
+    if executor is None:
+        planned = []
+        for i, (media_path, is_image) in enumerate(media):
+            global_idx = start_idx + i
+            print(f"Processing {os.path.basename(media_path)}... ({global_idx+1}/{num_media})")
+            print(f"PROGRESS_UPDATE:{int(((global_idx+1) / num_media) * progress_span)}")
+            start_time, duration = _pick_clip(media_path, is_image, scorer, target_clip_duration, max_frames)
+            planned.append((media_path, start_time, duration))
+        return planned
+    
+    results = {}
+    futures = []
+    for media_path, is_image in media:
+        if is_image:
+            results[media_path] = (media_path, *_pick_clip(media_path, True, None, target_clip_duration, max_frames))
+        else:
+            futures.append(executor.submit(_score_one, media_path, target_clip_duration, max_frames))
+    
+    done = len(results)
+    for future in as_completed(futures):
+        media_path, start_time, duration = future.result()
+        results[media_path] = (media_path, start_time, duration)
+        done += 1
+        print(f"Processed {os.path.basename(media_path)} ({start_idx + done}/{num_media})")
+        print(f"PROGRESS_UPDATE:{int(((start_idx + done) / num_media) * progress_span)}")
+    
+    return [results[media_path] for media_path, _ in media]
+
+
+def _scores_to_arrays(scores):
+    """Splits an (N, 2) score array (or (timestamp, score) pairs) into contiguous float64 columns."""
+    scores = np.asarray(scores, dtype=np.float64).reshape(-1, 2)
+    return np.ascontiguousarray(scores[:, 0]), np.ascontiguousarray(scores[:, 1])
+
+def find_best_window(scores, duration):
+    """
+    Returns (start_time, avg_score) of the window [t, t + duration] with the highest
+    average score, considering only windows that end by the last timestamp.
+    """
+    if not len(scores):
+        return 0, -1
+    times, vals = _scores_to_arrays(scores)
+    return best_window(times, vals, duration)
 
 if __name__ == "__main__":
     main()
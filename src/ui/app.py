@@ -1,8 +1,10 @@
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 import os
-import glob
+import re
 from pathlib import Path
 import sys
+from concurrent.futures import ThreadPoolExecutor
 
 # Add project root to path so we can import src modules
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
@@ -16,6 +18,43 @@ from src.utils.memory_monitor import (
 )
 from src.utils.file_manager import get_media_files
 
+# Process log: redraw interval (seconds) and number of trailing lines shown
+LOG_FLUSH_INTERVAL = 0.25
+LOG_MAX_LINES = 500
+
+# Progress markers in the process log
+_PROGRESS_RE = re.compile(r"PROGRESS_UPDATE:(\d+)")
+_PCT_RE = re.compile(r"(\d+)%")
+
+# Optional: header-only MP3 duration (avoids spawning ffmpeg per track)
+try:
+    from mutagen.mp3 import MP3
+except ImportError:
+    MP3 = None
+
+
+def scan_media(folder):
+    """
+    (videos, images, media_key) for the folder. Rescanned on every run: the scan is
+    recursive, so the top folder's mtime does not show changes in subfolders.
+    media_key holds each file's (path, mtime) and changes whenever a file is added,
+    removed or rewritten.
+    """
+    videos, images = get_media_files(folder, with_mtime=True)
+    media_key = tuple(videos) + tuple(images)
+    return [p for p, _ in videos], [p for p, _ in images], media_key
+
+
+def estimate_memory(media_key, videos, images, clip_duration):
+    """estimate_total_memory for the scanned media, kept in session state until a file changes."""
+    key = (media_key, clip_duration)
+    cached = st.session_state.get('memory_estimate')
+    if cached is None or cached[0] != key:
+        cached = (key, estimate_total_memory(videos + images, target_width=1920, clip_duration=clip_duration,
+                                             image_flags=[False] * len(videos) + [True] * len(images)))
+        st.session_state.memory_estimate = cached
+    return cached[1]
+
 st.set_page_config(page_title="AI Video Highlight Generator", page_icon="🎬", layout="wide")
 
 st.title("🎬 AI Video Highlight Generator")
@@ -37,34 +76,36 @@ st.sidebar.header("Configuration")
 # 1. Input Folder
 st.sidebar.subheader("1. Media Source")
 
-# Use session state to track and clean the input
-if 'input_folder_raw' not in st.session_state:
-    st.session_state.input_folder_raw = ""
-
 input_folder_raw = st.sidebar.text_input("Input Folder Path", 
-                                          value=st.session_state.input_folder_raw,
                                           placeholder=r"C:\path\to\your\videos")
 
-# Auto-clean quotes from the input
+# Auto-clean quotes from the input (text_input keeps the raw value across reruns)
 input_folder = input_folder_raw.strip().strip('"').strip("'")
 
-# Update session state with cleaned value for next render
-if input_folder != st.session_state.input_folder_raw:
-    st.session_state.input_folder_raw = input_folder
-    st.rerun()
-
 # 2. Music Selection
 st.sidebar.subheader("2. Background Music")
 music_folder = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "bg_music")
 os.makedirs(music_folder, exist_ok=True)
 
-music_files = glob.glob(os.path.join(music_folder, "*.mp3"))
+@st.cache_data(ttl=30)
+def list_music_files(folder, mtime):
+    """(path, file name) of each .mp3 in the folder; cached until the folder changes (or 30 s pass)"""
+    with os.scandir(folder) as entries:
+        return [(e.path, e.name) for e in entries if e.name.lower().endswith('.mp3') and e.is_file()]
+
+music_files = list_music_files(music_folder, os.path.getmtime(music_folder))
 
 # Get duration for each music file and create formatted options
 from moviepy.editor import AudioFileClip
 
-def get_audio_duration(file_path):
-    """Get duration of audio file in seconds"""
+@st.cache_data
+def get_audio_duration(file_path, mtime):
+    """Get duration of audio file in seconds (cached until the file's mtime changes)"""
+    if MP3 is not None:
+        try:
+            return MP3(file_path).info.length
+        except Exception:
+            pass  # Not a parseable MP3 header, let ffmpeg try
     try:
         audio = AudioFileClip(file_path)
         duration = audio.duration
@@ -79,11 +120,16 @@ def format_duration(seconds):
     secs = int(seconds % 60)
     return f"{minutes}:{secs:02d}"
 
+# Probe tracks concurrently: uncached lookups wait on file reads or an ffmpeg subprocess.
+# The workers get this run's script context so st.cache_data works from them
+with ThreadPoolExecutor(max_workers=8, initializer=add_script_run_ctx,
+                        initargs=(None, get_script_run_ctx())) as executor:
+    music_durations = list(executor.map(lambda f: get_audio_duration(f, os.path.getmtime(f)),
+                                        [f for f, _ in music_files]))
+
 # Create list of (display_name, file_path, duration) tuples
 music_data = []
-for f in music_files:
-    duration = get_audio_duration(f)
-    basename = os.path.basename(f)
+for (f, basename), duration in zip(music_files, music_durations):
     display_name = f"{format_duration(duration)} - {basename}"
     music_data.append((display_name, f, duration))
 
@@ -93,6 +139,9 @@ music_data.sort(key=lambda x: x[2], reverse=True)
 # Create options dict with display names
 music_options = {item[0]: item[1] for item in music_data}
 
+# Durations by path, reused below instead of reopening the selected track
+st.session_state['music_durations'] = {fp: dur for _, fp, dur in music_data}
+
 selected_music_name = st.sidebar.selectbox(
     "Select Music Track", 
     options=list(music_options.keys()) if music_files else ["No music found"],
@@ -241,15 +290,12 @@ st.subheader("📊 Preview Information")
 if input_folder and os.path.exists(input_folder) and selected_music_path:
     try:
         # Get media files
-        videos, images = get_media_files(input_folder)
+        videos, images, media_key = scan_media(input_folder)
         all_media = videos + images
         
         if all_media:
             # Get audio duration
-            from moviepy.editor import AudioFileClip
-            audio = AudioFileClip(selected_music_path)
-            audio_duration = audio.duration
-            audio.close()
+            audio_duration = st.session_state['music_durations'][selected_music_path]
             
             # Calculate clip durations
             num_media = len(all_media)
@@ -311,7 +357,7 @@ if st.sidebar.button("Generate Highlight Video", type="primary"):
             
             try:
                 # Get media files
-                videos, images = get_media_files(input_folder)
+                videos, images, media_key = scan_media(input_folder)
                 all_media = videos + images
                 
                 if not all_media:
@@ -321,18 +367,14 @@ if st.sidebar.button("Generate Highlight Video", type="primary"):
                 st.write(f"Found {len(videos)} videos and {len(images)} images.")
                 
                 # Estimate memory
-                from moviepy.editor import AudioFileClip
-                audio = AudioFileClip(selected_music_path)
-                audio_duration = audio.duration
-                audio.close()
+                audio_duration = st.session_state['music_durations'][selected_music_path]
                 
                 num_media = len(all_media)
                 transition_duration = 0.5
                 target_total_duration = audio_duration + (num_media - 1) * transition_duration
                 target_clip_duration = target_total_duration / num_media if num_media > 0 else 5.0
                 
-                memory_estimate = estimate_total_memory(all_media, target_width=1920, 
-                                                        clip_duration=target_clip_duration)
+                memory_estimate = estimate_memory(media_key, videos, images, target_clip_duration)
                 
                 # Display memory info
                 col1, col2 = st.columns(2)
@@ -341,13 +383,16 @@ if st.sidebar.button("Generate Highlight Video", type="primary"):
                 with col2:
                     st.metric("Peak Memory", format_memory_size(memory_estimate['peak_memory']))
                 
+                if memory_estimate['truncated']:
+                    st.warning(f"Estimate stopped after {len(memory_estimate['per_file'])} of {num_media} files: "
+                               f"they alone far exceed system memory, so batch processing is clearly needed.")
+                
                 # Check safety
                 is_safe, warning_level, message = check_memory_safety(memory_estimate['peak_memory'])
                 
                 if warning_level == 'danger':
                     st.error(message)
-                    recommended_batch = calculate_optimal_batch_size(all_media, target_width=1920,
-                                                                    clip_duration=target_clip_duration)
+                    recommended_batch = calculate_optimal_batch_size(memory_estimate)
                     st.warning(f"⚠️ **Recommendation**: Enable batch processing with batch size {recommended_batch} to prevent crashes.")
                     st.info("You can configure batch size in Advanced Settings above.")
                     
@@ -377,17 +422,17 @@ if st.sidebar.button("Generate Highlight Video", type="primary"):
             # Define output path
             output_path = os.path.join(project_root, output_filename)
             
-            # Clean inputs
-            clean_input_folder = input_folder.strip().strip('"').strip("'")
-            
             # Call the main processing function
             with st.spinner("Analyzing media, scoring clips, and rendering video..."):
                 import subprocess
+                import queue
+                import threading
+                import time
                 
                 # Construct command
                 cmd = [
                     sys.executable, "-m", "src.main",
-                    "--input", clean_input_folder,
+                    "--input", input_folder,
                     "--audio", selected_music_path,
                     "--output", output_path
                 ]
@@ -419,38 +464,66 @@ if st.sidebar.button("Generate Highlight Video", type="primary"):
                 # Render a scroll target HERE so it exists while the loop below is running
                 st.markdown("<div id='active-scroll-target'></div>", unsafe_allow_html=True)
                 
+                # Read output on a background thread and redraw the log in batches:
+                # a Streamlit update per line throttles the subprocess on verbose output
+                output_queue = queue.Queue()
+                
+                def read_output():
+                    for out_line in iter(process.stdout.readline, ''):
+                        output_queue.put(out_line)
+                    output_queue.put(None)  # End of output
+                
+                threading.Thread(target=read_output, daemon=True).start()
+                
                 with log_container:
-                    # Use iter(process.stdout.readline, '') to read line by line
-                    for line in iter(process.stdout.readline, ''):
+                    log_placeholder = st.empty()
+                
+                log_lines = []
+                shown_pct = None
+                finished = False
+                while not finished:
+                    time.sleep(LOG_FLUSH_INTERVAL)
+                    
+                    new_lines = False
+                    while True:
+                        try:
+                            line = output_queue.get_nowait()
+                        except queue.Empty:
+                            break
+                        if line is None:
+                            finished = True
+                            break
+                        
                         line = line.strip()
                         if not line: continue
                         
-                        st.text(line)
+                        log_lines.append(line)
+                        new_lines = True
                         
                         # Parse progress
-                        if "PROGRESS_UPDATE:" in line:
-                            try:
-                                pct = int(line.split(":")[-1])
-                                progress_bar.progress(pct)
-                                status_text.text(f"Processing media... {pct}%")
-                            except:
-                                pass
+                        pct = None
+                        match = _PROGRESS_RE.search(line)
+                        if match:
+                            pct = int(match.group(1))
+                            status = f"Processing media... {pct}%"
                         
                         # Parse MoviePy progress (rendering)
                         # MoviePy output format: "t:  41%|..."
-                        if "t:" in line and "%" in line:
-                            try:
-                                # Extract percentage
-                                import re
-                                match = re.search(r"(\d+)%", line)
-                                if match:
-                                    render_pct = int(match.group(1))
-                                    # Map 0-100 rendering to 80-100 overall
-                                    overall_pct = 80 + int(render_pct * 0.2)
-                                    progress_bar.progress(overall_pct)
-                                    status_text.text(f"Rendering video... {render_pct}%")
-                            except:
-                                pass
+                        if "t:" in line:
+                            match = _PCT_RE.search(line)
+                            if match:
+                                render_pct = int(match.group(1))
+                                # Map 0-100 rendering to 80-100 overall
+                                pct = 80 + int(render_pct * 0.2)
+                                status = f"Rendering video... {render_pct}%"
+                        
+                        if pct is not None and pct != shown_pct:
+                            progress_bar.progress(pct)
+                            status_text.text(status)
+                            shown_pct = pct
+                    
+                    if new_lines:
+                        log_placeholder.text("\n".join(log_lines[-LOG_MAX_LINES:]))
                 
                 process.wait()
                 
@@ -0,0 +1,29 @@
+"""
+Numba kernel for the per-file memory arithmetic of estimate_total_memory.
+estimate_clip_memory_jit is None when numba is not installed.
+"""
+
+import numpy as np
+
+# Optional: JIT-compiled estimate loop
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+
+def _estimate_loop(widths, heights, durations, fps, reader_buffer_frames):
+    """estimate_clip_memory for each clip, with the same int truncations."""
+    out = np.empty(widths.size, np.int64)
+    for i in range(widths.size):
+        num_frames = int(durations[i] * fps[i])
+        buffer_frames = min(num_frames, reader_buffer_frames)
+        base_memory = widths[i] * heights[i] * 3 * buffer_frames
+        out[i] = int(base_memory * 1.3) + widths[i] * heights[i] * 3 * 2
+    return out
+
+
+if njit is not None:
+    estimate_clip_memory_jit = njit(cache=True)(_estimate_loop)
+else:
+    estimate_clip_memory_jit = None
@@ -1,30 +1,58 @@
 import os
-from pathlib import Path
-from typing import List, Tuple
+from typing import Iterator, List, Tuple
 
-VIDEO_EXTENSIONS = {'.mp4', '.mov', '.avi', '.mkv'}
-IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png'}
+# Lowercase, without the dot
+VIDEO_EXTENSIONS = frozenset({'mp4', 'mov', 'avi', 'mkv'})
+IMAGE_EXTENSIONS = frozenset({'jpg', 'jpeg', 'png'})
 
-def get_media_files(directory: str) -> Tuple[List[str], List[str]]:
+def _walk(directory: str) -> Iterator[os.DirEntry]:
+    """Yields every file entry under the directory, recursively."""
+    try:
+        entries = os.scandir(directory)
+    except PermissionError:
+        return  # Unreadable folders are skipped, as Path.rglob did
+    with entries:
+        for entry in entries:
+            # Both checks use the type cached from the directory read (no stat on most systems)
+            if entry.is_dir(follow_symlinks=False):
+                yield from _walk(entry.path)
+            elif entry.is_file():
+                yield entry
+
+def get_media_files(directory: str, with_mtime: bool = False) -> Tuple[List, List]:
     """
     Scans the directory for video and image files.
     Returns a tuple: (video_paths, image_paths)
+    With with_mtime=True, each entry is a (path, mtime) tuple instead, taken from
+    the same stat as the sort so callers need no second stat per file.
     """
     video_files = []
     image_files = []
     
-    path = Path(directory)
-    if not path.exists():
+    if not os.path.exists(directory):
         raise FileNotFoundError(f"Directory not found: {directory}")
 
-    for file in path.rglob('*'):
-        if file.suffix.lower() in VIDEO_EXTENSIONS:
-            video_files.append(str(file.absolute()))
-        elif file.suffix.lower() in IMAGE_EXTENSIONS:
-            image_files.append(str(file.absolute()))
-            
-    # Sort by creation time
-    video_files.sort(key=lambda x: os.path.getctime(x))
-    image_files.sort(key=lambda x: os.path.getctime(x))
+    # Entry paths extend the root they were scanned from, so an absolute root makes them absolute
+    abs_root = os.path.abspath(directory)
+    for entry in _walk(abs_root):
+        _, dot, suffix = entry.name.rpartition('.')
+        if not dot:
+            continue
+        suffix = suffix.lower()
+        if suffix in VIDEO_EXTENSIONS:
+            target = video_files
+        elif suffix in IMAGE_EXTENSIONS:
+            target = image_files
+        else:
+            continue
+        # Only media files are stat'd, once each
+        st = entry.stat()
+        target.append((st.st_ctime, entry.path, st.st_mtime))
             
-    return video_files, image_files
+    # Sort by creation time (plain tuple comparison; equal times fall back to the path)
+    video_files.sort()
+    image_files.sort()
+    
+    if with_mtime:
+        return [(p, mtime) for _, p, mtime in video_files], [(p, mtime) for _, p, mtime in image_files]
+    return [p for _, p, _ in video_files], [p for _, p, _ in image_files]
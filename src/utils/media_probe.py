@@ -0,0 +1,36 @@
+"""
+Cheap media probing helpers that read container metadata without decoding frames.
+"""
+
+import cv2
+
+
+def video_duration(path: str) -> float:
+    """
+    Returns the video duration in seconds from the container's frame count and fps,
+    or 0.0 if it cannot be determined.
+    """
+    cap = cv2.VideoCapture(path)
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        frame_count = cap.get(cv2.CAP_PROP_FRAME_COUNT)
+    finally:
+        cap.release()
+    if fps <= 0 or frame_count <= 0:
+        return 0.0
+    return frame_count / fps
+
+
+def video_display_rotation(path: str) -> int:
+    """
+    Returns the rotation in degrees stored in the video stream's display matrix
+    (same sign as ffprobe's side_data rotation), or 0 if there is none.
+    """
+    cap = cv2.VideoCapture(path)
+    try:
+        # OpenCV reports the clockwise rotation needed to display the video upright
+        clockwise = int(round(cap.get(cv2.CAP_PROP_ORIENTATION_META)))
+    finally:
+        cap.release()
+    rotation = -clockwise
+    return rotation + 360 if rotation <= -180 else rotation
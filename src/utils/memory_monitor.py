@@ -8,9 +8,69 @@ import os
 import psutil
 import subprocess
 import json
-from typing import List, Tuple, Dict
+import threading
+import time
+import numpy as np
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from fractions import Fraction
+from functools import lru_cache
+from typing import List, Tuple, Dict, Optional, Union
 from pathlib import Path
 
+from src.utils._memory_numba import estimate_clip_memory_jit
+
+# Optional: in-process container metadata (avoids spawning ffprobe per video)
+try:
+    import av
+except ImportError:
+    av = None
+
+# ffprobe results persisted across runs, keyed on path, mtime and size
+PROBE_CACHE_PATH = os.path.expanduser("~/.cache/video-highlight/probe.json")
+
+# Extensions (lowercase, without the dot) estimated as still images
+IMAGE_EXTENSIONS = frozenset({'jpg', 'jpeg', 'png', 'bmp', 'gif'})
+
+# Decoded frames MoviePy's ffmpeg reader keeps in memory per open clip
+READER_BUFFER_FRAMES = 16
+
+# estimate_total_memory probes files in chunks of this size, and stops early once the
+# running estimate exceeds ESTIMATE_CUTOFF_FACTOR times the machine's total memory
+ESTIMATE_CHUNK_SIZE = 64
+ESTIMATE_CUTOFF_FACTOR = 10
+
+# psutil.virtual_memory() results are reused for this long (seconds)
+MEMORY_INFO_TTL = 0.1
+
+MemorySnapshot = namedtuple('MemorySnapshot', 'total available')
+
+_memory_info = {'time': float('-inf'), 'value': None}
+_probe_cache = None  # Loaded from PROBE_CACHE_PATH on first use
+_probe_cache_dirty = False
+# Guards _probe_cache: probe threads and concurrent Streamlit sessions share it
+_probe_cache_lock = threading.Lock()
+
+
+def _virtual_memory():
+    """psutil.virtual_memory(), reused for MEMORY_INFO_TTL across the estimate/check calls."""
+    now = time.monotonic()
+    if now - _memory_info['time'] > MEMORY_INFO_TTL:
+        _memory_info['value'] = psutil.virtual_memory()
+        _memory_info['time'] = now
+    return _memory_info['value']
+
+
+def get_memory_snapshot() -> MemorySnapshot:
+    """
+    Get total and available system memory from a single psutil reading.
+    
+    Returns:
+        MemorySnapshot: (total, available) in bytes
+    """
+    mem = _virtual_memory()
+    return MemorySnapshot(mem.total, mem.available)
+
 
 def get_available_memory() -> int:
     """
@@ -19,7 +79,7 @@ def get_available_memory() -> int:
     Returns:
         int: Available memory in bytes
     """
-    return psutil.virtual_memory().available
+    return _virtual_memory().available
 
 
 def get_total_memory() -> int:
@@ -29,7 +89,7 @@ def get_total_memory() -> int:
     Returns:
         int: Total memory in bytes
     """
-    return psutil.virtual_memory().total
+    return _virtual_memory().total
 
 
 def format_memory_size(bytes_size: int) -> str:
@@ -42,6 +102,12 @@ def format_memory_size(bytes_size: int) -> str:
     Returns:
         str: Formatted string (e.g., "1.5 GB")
     """
+    # Whole bytes as the cache key: sibling clips often have identical estimates
+    return _format_memory_size(int(bytes_size))
+
+
+@lru_cache(maxsize=4096)
+def _format_memory_size(bytes_size: int) -> str:
     for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
         if bytes_size < 1024.0:
             return f"{bytes_size:.2f} {unit}"
@@ -49,10 +115,50 @@ def format_memory_size(bytes_size: int) -> str:
     return f"{bytes_size:.2f} PB"
 
 
+def _load_probe_cache() -> Dict:
+    """Returns the shared probe dict; callers must hold _probe_cache_lock."""
+    global _probe_cache
+    if _probe_cache is None:
+        try:
+            with open(PROBE_CACHE_PATH, 'r') as f:
+                _probe_cache = json.load(f)
+        except (OSError, ValueError):
+            _probe_cache = {}
+    return _probe_cache
+
+
+def save_probe_cache():
+    """
+    Write new ffprobe results to the on-disk probe cache.
+    """
+    global _probe_cache_dirty
+    # Serialize a copy so other threads can keep adding entries while it is written
+    with _probe_cache_lock:
+        if not _probe_cache_dirty:
+            return
+        snapshot = dict(_probe_cache)
+        _probe_cache_dirty = False
+    try:
+        os.makedirs(os.path.dirname(PROBE_CACHE_PATH), exist_ok=True)
+        # Write then rename so an interrupted run never leaves a truncated cache file;
+        # the temporary name is per thread so concurrent saves don't share it
+        tmp_path = f"{PROBE_CACHE_PATH}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, PROBE_CACHE_PATH)
+    except (OSError, TypeError, ValueError) as e:
+        print(f"Warning: Could not write probe cache: {e}")
+        with _probe_cache_lock:
+            _probe_cache_dirty = True
+
+
 def get_video_info(video_path: str) -> Dict:
     """
     Get video metadata using ffprobe.
     
+    Results are cached on (path, mtime, size), in memory and in PROBE_CACHE_PATH,
+    so unchanged files are only probed once.
+    
     Args:
         video_path: Path to video file
         
@@ -60,12 +166,78 @@ def get_video_info(video_path: str) -> Dict:
         dict: Video metadata including width, height, duration, fps
     """
     try:
+        stat = os.stat(video_path)
+    except OSError as e:
+        print(f"Warning: Could not get video info for {video_path}: {e}")
+        return None
+    
+    info = _cached_video_info(video_path, stat.st_mtime_ns, stat.st_size)
+    return dict(info) if info else None
+
+
+@lru_cache(maxsize=4096)
+def _cached_video_info(video_path: str, mtime_ns: int, size: int) -> Optional[Dict]:
+    global _probe_cache_dirty
+    key = f"{video_path}|{mtime_ns}|{size}"
+    with _probe_cache_lock:
+        info = _load_probe_cache().get(key)
+    if info is not None:
+        return info
+    
+    info = _read_video_info(video_path) if av is not None else _probe_video_info(video_path)
+    if info:
+        with _probe_cache_lock:
+            _probe_cache[key] = info
+            _probe_cache_dirty = True
+    return info
+
+
+def _parse_rate(rate: str) -> float:
+    """Parses an ffprobe frame rate ("30000/1001" or "30"), falling back to 30 fps."""
+    try:
+        fps = float(Fraction(rate))
+    except (ValueError, ZeroDivisionError, TypeError):
+        return 30.0
+    return fps if fps > 0 else 30.0
+
+
+def _read_video_info(video_path: str) -> Optional[Dict]:
+    """Reads the container header in-process with PyAV (uncached)."""
+    try:
+        with av.open(video_path, metadata_errors='ignore') as container:
+            stream = container.streams.video[0]
+            if container.duration is not None:
+                duration = container.duration / av.time_base
+            elif stream.duration is not None and stream.time_base is not None:
+                duration = float(stream.duration * stream.time_base)
+            else:
+                duration = 0.0
+            rate = stream.average_rate or stream.guessed_rate
+            
+            return {
+                'width': stream.width or 1920,
+                'height': stream.height or 1080,
+                'duration': float(duration),
+                'fps': float(rate) if rate else 30.0,
+                'codec': stream.codec_context.name or 'unknown'
+            }
+    except Exception as e:
+        print(f"Warning: Could not get video info for {video_path}: {e}")
+        return None
+
+
+def _probe_video_info(video_path: str) -> Optional[Dict]:
+    """Runs ffprobe on the file (uncached); used when PyAV is not installed."""
+    try:
+        # Only the first video stream and the fields used below; capped probing keeps long files fast
         cmd = [
             'ffprobe',
             '-v', 'quiet',
+            '-probesize', '1M',
+            '-analyzeduration', '1M',
+            '-select_streams', 'v:0',
+            '-show_entries', 'stream=width,height,r_frame_rate,codec_name:format=duration',
             '-print_format', 'json',
-            '-show_format',
-            '-show_streams',
             video_path
         ]
         
@@ -75,21 +247,16 @@ def get_video_info(video_path: str) -> Dict:
             
         data = json.loads(result.stdout)
         
-        # Find video stream
-        video_stream = None
-        for stream in data.get('streams', []):
-            if stream.get('codec_type') == 'video':
-                video_stream = stream
-                break
-        
-        if not video_stream:
+        streams = data.get('streams', [])
+        if not streams:
             return None
+        video_stream = streams[0]
         
         return {
             'width': int(video_stream.get('width', 1920)),
             'height': int(video_stream.get('height', 1080)),
             'duration': float(data.get('format', {}).get('duration', 0)),
-            'fps': eval(video_stream.get('r_frame_rate', '30/1')),  # e.g., "30/1" -> 30.0
+            'fps': _parse_rate(video_stream.get('r_frame_rate', '30/1')),  # e.g., "30/1" -> 30.0
             'codec': video_stream.get('codec_name', 'unknown')
         }
     except Exception as e:
@@ -114,18 +281,23 @@ def estimate_video_memory(video_path: str, target_width: int = 1920) -> int:
     Returns:
         int: Estimated memory in bytes
     """
+    return estimate_clip_memory(*_video_clip_params(video_path, target_width))
+
+
+def _video_clip_params(video_path: str, target_width: int) -> Tuple[int, int, float, float]:
+    """(width, height, duration, fps) of the video as processed, for estimate_clip_memory."""
     info = get_video_info(video_path)
     
     if not info:
         # Fallback estimation for unknown videos
         # Assume 1080p, 30fps, 10 seconds
-        return estimate_clip_memory(1920, 1080, 10.0, 30)
+        return 1920, 1080, 10.0, 30
     
     # Calculate target height maintaining aspect ratio
     aspect_ratio = info['width'] / info['height']
     target_height = int(target_width / aspect_ratio)
     
-    return estimate_clip_memory(target_width, target_height, info['duration'], info['fps'])
+    return target_width, target_height, info['duration'], info['fps']
 
 
 def estimate_image_memory(image_path: str, duration: float = 5.0, target_width: int = 1920) -> int:
@@ -140,10 +312,13 @@ def estimate_image_memory(image_path: str, duration: float = 5.0, target_width:
     Returns:
         int: Estimated memory in bytes
     """
+    return estimate_clip_memory(*_image_clip_params(image_path, duration, target_width))
+
+
+def _image_clip_params(image_path: str, duration: float, target_width: int) -> Tuple[int, int, float, float]:
+    """(width, height, duration, fps) of the image clip as processed, for estimate_clip_memory."""
     try:
-        from PIL import Image
-        img = Image.open(image_path)
-        width, height = img.size
+        width, height = _get_image_size(image_path, os.path.getmtime(image_path))
         
         # Calculate target height maintaining aspect ratio
         aspect_ratio = width / height
@@ -151,11 +326,31 @@ def estimate_image_memory(image_path: str, duration: float = 5.0, target_width:
         
         # Images in MoviePy are simpler - just one frame repeated
         # But we still need to account for processing overhead
-        return estimate_clip_memory(target_width, target_height, duration, 1)
+        return target_width, target_height, duration, 1
     except Exception as e:
         print(f"Warning: Could not get image info for {image_path}: {e}")
         # Fallback: assume standard photo
-        return estimate_clip_memory(1920, 1080, duration, 1)
+        return 1920, 1080, duration, 1
+
+
+def _is_image(media_path: str) -> bool:
+    return media_path.rpartition('.')[2].lower() in IMAGE_EXTENSIONS
+
+
+def _clip_params(media_path: str, is_image: bool, target_width: int,
+                 clip_duration: float) -> Tuple[int, int, float, float]:
+    """Clip parameters for one media file, as an image or a video."""
+    if is_image:
+        return _image_clip_params(media_path, clip_duration, target_width)
+    return _video_clip_params(media_path, target_width)
+
+
+@lru_cache(maxsize=4096)
+def _get_image_size(image_path: str, mtime: float) -> Tuple[int, int]:
+    """Image (width, height) from the file header, cached until the file changes."""
+    from PIL import Image
+    with Image.open(image_path) as img:
+        return img.size
 
 
 def estimate_clip_memory(width: int, height: int, duration: float, fps: float) -> int:
@@ -166,9 +361,8 @@ def estimate_clip_memory(width: int, height: int, duration: float, fps: float) -
     Memory = width * height * 3 (RGB) * number_of_frames
     
     We add overhead for:
-    - MoviePy internal structures (~20%)
-    - Processing buffers (~30%)
-    - Resizing operations (~50% extra during processing)
+    - MoviePy internal structures and processing buffers (~30%)
+    - The resized frames created during assembly (two frames)
     
     Args:
         width: Video width in pixels
@@ -183,20 +377,59 @@ def estimate_clip_memory(width: int, height: int, duration: float, fps: float) -
     bytes_per_pixel = 3  # RGB
     num_frames = int(duration * fps)
     
-    # MoviePy doesn't load all frames at once, but keeps a buffer
-    # Estimate ~2 seconds of frames in memory at a time
-    buffer_frames = min(num_frames, int(2 * fps))
+    # MoviePy doesn't load all frames at once: its ffmpeg reader only holds
+    # a handful of decoded frames (about one GOP) per open clip
+    buffer_frames = min(num_frames, READER_BUFFER_FRAMES)
     
     base_memory = width * height * bytes_per_pixel * buffer_frames
     
-    # Add overhead (2x for safety margin during processing)
-    total_memory = base_memory * 2
+    # Add overhead (30% for processing), plus the resized frame (and its
+    # copy) produced during final assembly
+    total_memory = int(base_memory * 1.3) + width * height * bytes_per_pixel * 2
     
     return int(total_memory)
 
 
+def estimate_file_memory(media_path: str, target_width: int = 1920, clip_duration: float = 5.0) -> int:
+    """
+    Estimate memory for one media file, as an image or a video depending on its extension.
+    
+    Args:
+        media_path: Path to media file
+        target_width: Target width for processing
+        clip_duration: Duration an image will be displayed
+        
+    Returns:
+        int: Estimated memory in bytes
+    """
+    return estimate_clip_memory(*_clip_params(media_path, _is_image(media_path), target_width, clip_duration))
+
+
+def estimate_clip_memory_array(widths: np.ndarray, heights: np.ndarray, durations: np.ndarray,
+                               fps: np.ndarray) -> np.ndarray:
+    """
+    Vectorized estimate_clip_memory over arrays of clip parameters.
+    
+    Returns:
+        np.ndarray: Estimated memory in bytes per clip (int64)
+    """
+    widths = np.asarray(widths, dtype=np.int64)
+    heights = np.asarray(heights, dtype=np.int64)
+    durations = np.asarray(durations, dtype=np.float64)
+    fps = np.asarray(fps, dtype=np.float64)
+    
+    if estimate_clip_memory_jit is not None:
+        return estimate_clip_memory_jit(widths, heights, durations, fps, READER_BUFFER_FRAMES)
+    
+    # Same arithmetic as estimate_clip_memory, including its truncations
+    num_frames = (durations * fps).astype(np.int64)
+    buffer_frames = np.minimum(num_frames, READER_BUFFER_FRAMES)
+    base_memory = widths * heights * 3 * buffer_frames
+    return (base_memory * 1.3).astype(np.int64) + widths * heights * 3 * 2
+
+
 def estimate_total_memory(media_files: List[str], target_width: int = 1920, 
-                         clip_duration: float = 5.0) -> Dict:
+                         clip_duration: float = 5.0, image_flags: Optional[List[bool]] = None) -> Dict:
     """
     Estimate total memory needed to process all media files.
     
@@ -204,49 +437,71 @@ def estimate_total_memory(media_files: List[str], target_width: int = 1920,
         media_files: List of media file paths
         target_width: Target width for processing
         clip_duration: Average duration per clip
+        image_flags: Whether each file is an image, when already known from the
+            scan (default: classified by extension)
         
     Returns:
         dict: {
             'total_estimated': total memory needed in bytes,
             'per_file': list of (filename, estimated_memory) tuples,
-            'peak_memory': estimated peak memory usage
+            'peak_memory': estimated peak memory usage,
+            'truncated': True if probing stopped early because the estimate already far
+                         exceeds system memory (totals then cover only per_file)
         }
     """
     per_file = []
     total = 0
+    truncated = False
     
-    for media_path in media_files:
-        ext = os.path.splitext(media_path)[1].lower()
-        
-        if ext in ['.jpg', '.jpeg', '.png', '.bmp', '.gif']:
-            estimated = estimate_image_memory(media_path, clip_duration, target_width)
-        else:
-            estimated = estimate_video_memory(media_path, target_width)
-        
-        per_file.append((os.path.basename(media_path), estimated))
-        total += estimated
+    # Add base overhead for Python, libraries, AI model
+    base_overhead = 2 * 1024 * 1024 * 1024  # 2 GB base
+    cutoff = get_total_memory() * ESTIMATE_CUTOFF_FACTOR
+    if image_flags is None:
+        image_flags = [_is_image(path) for path in media_files]
+    
+    # Probing is I/O bound (ffprobe subprocesses, image headers), so files are probed concurrently
+    with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4)) as executor:
+        for start in range(0, len(media_files), ESTIMATE_CHUNK_SIZE):
+            chunk = media_files[start:start + ESTIMATE_CHUNK_SIZE]
+            chunk_flags = image_flags[start:start + ESTIMATE_CHUNK_SIZE]
+            params = list(executor.map(lambda path, is_image: _clip_params(path, is_image, target_width, clip_duration),
+                                       chunk, chunk_flags))
+            
+            # One vectorized pass per chunk instead of estimate_clip_memory per file
+            widths, heights, durations, fps = np.array(params, dtype=np.float64).reshape(-1, 4).T
+            chunk_memory = estimate_clip_memory_array(widths, heights, durations, fps)
+            per_file.extend(zip([os.path.basename(p) for p in chunk], chunk_memory.tolist()))
+            total += int(chunk_memory.sum())
+            
+            # Clearly out of memory: the remaining files cannot change the outcome
+            if total + base_overhead > cutoff and start + ESTIMATE_CHUNK_SIZE < len(media_files):
+                truncated = True
+                break
+    
+    save_probe_cache()
     
     # Peak memory is when we have all clips loaded + assembly overhead
     # During assembly, we also create resized versions
     peak_memory = total * 1.5  # 50% overhead for assembly
     
-    # Add base overhead for Python, libraries, AI model
-    base_overhead = 2 * 1024 * 1024 * 1024  # 2 GB base
-    
     return {
         'total_estimated': int(total),
         'per_file': per_file,
-        'peak_memory': int(peak_memory + base_overhead)
+        'peak_memory': int(peak_memory + base_overhead),
+        'truncated': truncated
     }
 
 
-def check_memory_safety(estimated_memory: int, safety_factor: float = 0.8) -> Tuple[bool, str, str]:
+def check_memory_safety(estimated_memory: int, safety_factor: float = 0.8,
+                        available: Optional[int] = None) -> Tuple[bool, str, str]:
     """
     Check if there's enough memory available for processing.
     
     Args:
         estimated_memory: Estimated memory needed in bytes
         safety_factor: Use only this fraction of available memory (default: 0.8 = 80%)
+        available: Available memory in bytes, e.g. from get_memory_snapshot()
+            (default: read from the system)
         
     Returns:
         tuple: (is_safe, warning_level, message)
@@ -254,8 +509,10 @@ def check_memory_safety(estimated_memory: int, safety_factor: float = 0.8) -> Tu
             - warning_level: 'safe', 'warning', 'danger'
             - message: Human-readable message
     """
-    available = get_available_memory()
-    safe_available = available * safety_factor
+    if available is None:
+        available = get_available_memory()
+    # Whole-byte thresholds: integer comparisons give the same result as the float ones
+    safe_available = int(available * safety_factor)
     
     estimated_str = format_memory_size(estimated_memory)
     available_str = format_memory_size(available)
@@ -275,36 +532,41 @@ def check_memory_safety(estimated_memory: int, safety_factor: float = 0.8) -> Tu
                 f"Processing may crash. Please use batch processing or reduce the number of videos.")
 
 
-def calculate_optimal_batch_size(media_files: List[str], target_width: int = 1920,
-                                 clip_duration: float = 5.0, safety_factor: float = 0.7) -> int:
+def calculate_optimal_batch_size(media_files: Union[List[str], Dict], target_width: int = 1920,
+                                 clip_duration: float = 5.0, safety_factor: float = 0.7,
+                                 available: Optional[int] = None) -> int:
     """
     Calculate optimal batch size based on available memory.
     
     Args:
-        media_files: List of media file paths
-        target_width: Target width for processing
-        clip_duration: Average duration per clip
+        media_files: List of media file paths, or a result of estimate_total_memory
+            (its largest per-file estimate is used, so nothing is probed again)
+        target_width: Target width for processing (file list only)
+        clip_duration: Average duration per clip (file list only)
         safety_factor: Use only this fraction of available memory
+        available: Available memory in bytes (default: read from the system)
         
     Returns:
-        int: Recommended batch size (minimum 1)
+        int: Recommended batch size, the largest power of two that fits (minimum 1)
     """
     if not media_files:
         return 1
     
-    available = get_available_memory() * safety_factor
-    
-    # Estimate memory for a single file
-    sample_file = media_files[0]
-    ext = os.path.splitext(sample_file)[1].lower()
-    
-    if ext in ['.jpg', '.jpeg', '.png', '.bmp', '.gif']:
-        single_file_memory = estimate_image_memory(sample_file, clip_duration, target_width)
+    if isinstance(media_files, dict):
+        per_file = media_files['per_file']
+        if not per_file:
+            return 1
+        single_file_memory = max(estimated for _, estimated in per_file)
     else:
-        single_file_memory = estimate_video_memory(sample_file, target_width)
+        # Estimate memory for a single file
+        single_file_memory = estimate_file_memory(media_files[0], target_width, clip_duration)
+    
+    if available is None:
+        available = get_available_memory()
+    available *= safety_factor
     
     # Account for assembly overhead
-    single_file_memory = int(single_file_memory * 1.5)
+    single_file_memory = max(1, int(single_file_memory * 1.5))
     
     # Calculate how many files can fit
     batch_size = max(1, int(available / single_file_memory))
@@ -312,4 +574,5 @@ def calculate_optimal_batch_size(media_files: List[str], target_width: int = 192
     # Cap at reasonable maximum (100 files per batch)
     batch_size = min(batch_size, 100)
     
-    return batch_size
+    # Round down to a power of two, keeping a margin against estimation error
+    return 1 << (batch_size.bit_length() - 1)
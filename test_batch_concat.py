@@ -0,0 +1,88 @@
+"""
+Test script for the batch join timing.
+Run this to verify that batch outputs are joined without re-encoding.
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+
+import numpy as np
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from moviepy.editor import AudioClip, ColorClip
+
+from src.core.video_processor import VideoProcessor, fill_clip_duration
+from src.utils.media_probe import video_duration
+
+
+def write_batches(temp_dir, clip_duration, clips_per_batch, num_batches, transition_duration):
+    """Writes the batch outputs the way process_in_batches does (MoviePy, no audio or title)."""
+    batch_files = []
+    for batch_idx in range(num_batches):
+        clips = [ColorClip((320, 180), color=(40 * i, 80, 120), duration=clip_duration)
+                 for i in range(clips_per_batch)]
+        batch_output = os.path.join(temp_dir, f"batch_{batch_idx:03d}.mp4")
+        VideoProcessor().assemble_video(clips, None, batch_output,
+                                        transition_duration=transition_duration,
+                                        output_width=320, title_text=None)
+        batch_files.append(batch_output)
+    return batch_files
+
+
+def test_two_batch_plan_takes_copy_path(temp_dir):
+    """A two-batch plan with clip durations from fill_clip_duration joins by stream copy."""
+    print("=== Two-Batch Join Test ===")
+    audio_duration = 10.0
+    transition_duration = 0.5
+    clips_per_batch, num_batches = 2, 2
+    num_media = clips_per_batch * num_batches
+
+    audio_path = os.path.join(temp_dir, "music.wav")
+    AudioClip(lambda t: np.sin(440 * 2 * np.pi * t), duration=audio_duration, fps=44100) \
+        .write_audiofile(audio_path, fps=44100, logger=None)
+
+    # Durations planned for a single pass: one crossfade per join
+    single_pass = fill_clip_duration(audio_duration, num_media, transition_duration)
+    batch_files = write_batches(os.path.join(temp_dir, "single"), single_pass,
+                                clips_per_batch, num_batches, transition_duration)
+    total = sum(video_duration(bf) for bf in batch_files)
+    print(f"Single-pass plan: {single_pass:.3f}s per clip, batches total {total:.2f}s")
+    assert not VideoProcessor().matches_audio(batch_files, audio_path)
+
+    batched = fill_clip_duration(audio_duration, num_media, transition_duration, overlaps=num_media)
+    batch_files = write_batches(os.path.join(temp_dir, "batched"), batched,
+                                clips_per_batch, num_batches, transition_duration)
+    total = sum(video_duration(bf) for bf in batch_files)
+    print(f"Batched plan: {batched:.3f}s per clip, batches total {total:.2f}s")
+    video_proc = VideoProcessor()
+    assert video_proc.matches_audio(batch_files, audio_path), "batched plan should take the copy path"
+
+    output_path = os.path.join(temp_dir, "joined.mp4")
+    video_proc.concat_videos(batch_files, audio_path, output_path)
+    joined = video_duration(output_path)
+    print(f"Joined output: {joined:.2f}s (audio {audio_duration:.2f}s)")
+    assert abs(joined - audio_duration) <= 0.1
+    print()
+
+
+def main():
+    """Run all tests."""
+    print("Batch Concat Test Suite\n")
+
+    temp_dir = tempfile.mkdtemp(prefix="video_highlight_test_")
+    try:
+        os.makedirs(os.path.join(temp_dir, "single"))
+        os.makedirs(os.path.join(temp_dir, "batched"))
+        test_two_batch_plan_takes_copy_path(temp_dir)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    print("✅ Tests complete!")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,8 +10,7 @@ import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from src.utils.memory_monitor import (
-    get_available_memory,
-    get_total_memory,
+    get_memory_snapshot,
     format_memory_size,
     estimate_total_memory,
     check_memory_safety,
@@ -22,8 +21,7 @@ from src.utils.memory_monitor import (
 def test_memory_info():
     """Test basic memory information retrieval."""
     print("=== System Memory Information ===")
-    total = get_total_memory()
-    available = get_available_memory()
+    total, available = get_memory_snapshot()
     
     print(f"Total Memory: {format_memory_size(total)}")
     print(f"Available Memory: {format_memory_size(available)}")
@@ -66,8 +64,7 @@ def test_memory_estimation(test_folder):
     print(message)
     
     # Calculate optimal batch size
-    batch_size = calculate_optimal_batch_size(all_media, target_width=1920, 
-                                             clip_duration=clip_duration)
+    batch_size = calculate_optimal_batch_size(memory_estimate)
     print(f"\nRecommended batch size: {batch_size}")
     
     # Show per-file breakdown (first 5 files)